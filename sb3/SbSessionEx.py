@@ -130,6 +130,16 @@ class SbSessionEx:
         input = {'itemId': item_id}
         return client.delete_item(input, self)
 
+    def update_item(self, item_id, item_patch):
+        """Update only the given fields of an existing ScienceBase Item
+
+        :param item_id: ID of the ScienceBase Item to update
+        :param item_patch: Dictionary of the item fields to update
+        :return: The GraphQL response JSON
+        """
+        input = {'id': item_id, 'itemPatch': item_patch}
+        return client.update_item(input, self)
+
     def get_access_token(self):
         """_summary_
 
@@ -326,6 +326,48 @@ def delete_item(input, sb_session_ex):
 
     return sb_resp.json()
 
+def update_item(input, sb_session_ex):
+    """
+    Updates only the given fields of an item using the ScienceBase GraphQL API.
+
+    Args:
+        input (dict): The input parameters for the update operation.
+                        {"id": ..., "itemPatch": {...}}
+        sb_session_ex (object): An instance of the ScienceBaseSessionEx class.
+
+    Returns:
+        dict: The response from the ScienceBase API.
+
+    Raises:
+        Exception: If the response status code is not 200 or if there are errors in the response.
+    """
+
+    query = """
+            mutation UpdateItem($input: UpdateItemInput!) {
+                updateItem(input: $input) {
+                    item {
+                        id
+                    }
+                }
+            }
+        """
+
+    variables = {"input": input}
+
+    requests_session = requests.session()
+
+    sb_resp = requests_session.post(
+        sb_session_ex.get_graphql_url(),
+        headers=sb_session_ex.get_header(),
+        json={'query': query, 'variables': variables}
+    )
+
+    if sb_resp.status_code != 200 or 'errors' in sb_resp.json():
+        sb_session_ex.get_logger().error(sb_resp.json())
+        raise Exception("Not status 200")
+
+    return sb_resp.json()
+
 def _guess_mimetype(filename):
     """Guess mimetype of file
 
@@ -0,0 +1,231 @@
+"""CatalogMirror keeps a local SQLite copy of a ScienceBase Catalog subtree."""
+import json
+import sqlite3
+
+
+class CatalogMirror:
+    """CatalogMirror mirrors the items under a ScienceBase Catalog Item into a local SQLite database,
+    so that item JSON, files and extents can be queried locally.  After the first sync, subsequent
+    syncs only retrieve items updated since the previous one.
+    """
+    DEFAULT_FIELDS = 'title,summary,parentId,dateCreated,lastUpdated,tags,contacts,dates,webLinks,' \
+                     'browseCategories,files,facets,extents,spatial,permissions,hasChildren'
+    """ Item fields retrieved when syncing """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS items (
+            id TEXT PRIMARY KEY,
+            parent_id TEXT,
+            title TEXT,
+            last_updated TEXT,
+            json TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS items_parent_id ON items (parent_id);
+        CREATE INDEX IF NOT EXISTS items_last_updated ON items (last_updated);
+        CREATE TABLE IF NOT EXISTS files (
+            item_id TEXT NOT NULL,
+            name TEXT,
+            content_type TEXT,
+            size INTEGER,
+            checksum TEXT,
+            url TEXT,
+            facet TEXT
+        );
+        CREATE INDEX IF NOT EXISTS files_item_id ON files (item_id);
+        CREATE INDEX IF NOT EXISTS files_name ON files (name);
+        CREATE INDEX IF NOT EXISTS files_checksum ON files (checksum);
+        CREATE TABLE IF NOT EXISTS extents (
+            item_id TEXT NOT NULL,
+            extent_id TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS extents_item_id ON extents (item_id);
+        CREATE INDEX IF NOT EXISTS extents_extent_id ON extents (extent_id);
+        CREATE TABLE IF NOT EXISTS members (
+            root_id TEXT NOT NULL,
+            item_id TEXT NOT NULL,
+            PRIMARY KEY (root_id, item_id)
+        );
+        CREATE TABLE IF NOT EXISTS sync_state (
+            root_id TEXT PRIMARY KEY,
+            last_updated TEXT
+        );
+    """
+
+    def __init__(self, sb_session, database, fields=None):
+        """Open (or create) a local catalog mirror
+
+        :param sb_session: SbSession used to retrieve items from ScienceBase
+        :param database: Path of the SQLite database file
+        :param fields: Comma-separated item fields to mirror. Defaults to DEFAULT_FIELDS.
+        """
+        self._sb_session = sb_session
+        self._fields = fields if fields else self.DEFAULT_FIELDS
+        self._db = sqlite3.connect(database)
+        self._db.executescript(self._SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close the mirror database"""
+        self._db.close()
+
+    def sync(self, root_id, full=False):
+        """Synchronize the items under the given item with the mirror.  Only the items updated since the
+        previous sync of the same root are retrieved, unless a full sync is requested.  A full sync also
+        removes items which are no longer under the root item.
+
+        :param root_id: ScienceBase Catalog Item ID of the root of the subtree to mirror
+        :param full: Whether to retrieve every item, rather than only items updated since the last sync
+        :return: The number of items retrieved
+        """
+        last_updated = None if full else self.get_last_updated(root_id)
+        params = {'filter': 'ancestorsExcludingLinks=' + root_id, 'fields': self._fields,
+                  'max': self._sb_session._max_item_count}
+        if last_updated:
+            params = self._sb_session._add_filter(params, 'dateRange=' + json.dumps(
+                {'choice': 'range', 'dateType': 'lastUpdated', 'start': last_updated}))
+
+        count = 0
+        seen = set()
+        newest = last_updated
+        with self._db:
+            root_item = self._sb_session.get_item(root_id, params={'fields': self._fields})
+            if last_updated is None or self._is_newer(root_item, last_updated):
+                self._store(root_id, root_item)
+            seen.add(root_id)
+            for item in self._sb_session.iter_items(params):
+                self._store(root_id, item)
+                seen.add(item['id'])
+                count += 1
+                if item.get('lastUpdated') and (newest is None or item['lastUpdated'] > newest):
+                    newest = item['lastUpdated']
+            if full:
+                self._prune(root_id, seen)
+            if newest:
+                self._db.execute('INSERT OR REPLACE INTO sync_state (root_id, last_updated) VALUES (?, ?)',
+                                 (root_id, newest))
+        return count
+
+    def get_last_updated(self, root_id):
+        """Get the most recent lastUpdated value seen when syncing the given root item
+
+        :param root_id: ScienceBase Catalog Item ID of the root of the mirrored subtree
+        :return: lastUpdated date string, or None if the root has not been synced
+        """
+        row = self._db.execute('SELECT last_updated FROM sync_state WHERE root_id = ?', (root_id,)).fetchone()
+        return row[0] if row else None
+
+    def get_item(self, item_id):
+        """Get the mirrored JSON of an item
+
+        :param item_id: ScienceBase Catalog Item ID
+        :return: ScienceBase Catalog Item JSON, or None if the item is not mirrored
+        """
+        row = self._db.execute('SELECT json FROM items WHERE id = ?', (item_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_item_ids(self, root_id=None):
+        """Get the IDs of all mirrored items
+
+        :param root_id: If given, only return the items synced under this root item
+        :return: List of ScienceBase Catalog Item IDs
+        """
+        if root_id:
+            rows = self._db.execute('SELECT item_id FROM members WHERE root_id = ?', (root_id,))
+        else:
+            rows = self._db.execute('SELECT id FROM items')
+        return [row[0] for row in rows]
+
+    def get_child_ids(self, parent_id):
+        """Get the IDs of the mirrored immediate children of an item
+
+        :param parent_id: ScienceBase Catalog Item ID of the parent item
+        :return: List of ScienceBase Catalog Item IDs
+        """
+        rows = self._db.execute('SELECT id FROM items WHERE parent_id = ?', (parent_id,))
+        return [row[0] for row in rows]
+
+    def find_files(self, item_id=None, name=None, checksum=None):
+        """Find mirrored item files, including files on facets
+
+        :param item_id: Only return files of this item
+        :param name: Only return files with this name
+        :param checksum: Only return files with this checksum value
+        :return: List of dictionaries containing itemId, name, contentType, size, checksum, url and facet of each file
+        """
+        clauses = []
+        args = []
+        for column, value in (('item_id', item_id), ('name', name), ('checksum', checksum)):
+            if value is not None:
+                clauses.append(column + ' = ?')
+                args.append(value)
+        sql = 'SELECT item_id, name, content_type, size, checksum, url, facet FROM files'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        keys = ('itemId', 'name', 'contentType', 'size', 'checksum', 'url', 'facet')
+        return [dict(zip(keys, row)) for row in self._db.execute(sql, args)]
+
+    def get_extent_ids(self, item_id):
+        """Get the IDs of the extents of a mirrored item
+
+        :param item_id: ScienceBase Catalog Item ID
+        :return: List of extent IDs
+        """
+        rows = self._db.execute('SELECT extent_id FROM extents WHERE item_id = ?', (item_id,))
+        return [row[0] for row in rows]
+
+    def find_items_by_extent(self, extent_id):
+        """Get the IDs of the mirrored items using an extent
+
+        :param extent_id: ScienceBase extent ID
+        :return: List of ScienceBase Catalog Item IDs
+        """
+        rows = self._db.execute('SELECT item_id FROM extents WHERE extent_id = ?', (str(extent_id),))
+        return [row[0] for row in rows]
+
+    def query(self, sql, args=()):
+        """Run a read query directly against the mirror database
+
+        :param sql: SQL query
+        :param args: Query arguments
+        :return: List of result rows
+        """
+        return self._db.execute(sql, args).fetchall()
+
+    def _is_newer(self, item, last_updated):
+        """Whether the item was updated after the given lastUpdated date string"""
+        return item.get('lastUpdated') is None or item['lastUpdated'] > last_updated
+
+    def _store(self, root_id, item):
+        """Store an item, along with its files and extents, replacing any previous version"""
+        item_id = item['id']
+        self._db.execute('INSERT OR REPLACE INTO items (id, parent_id, title, last_updated, json) VALUES (?, ?, ?, ?, ?)',
+                         (item_id, item.get('parentId'), item.get('title'), item.get('lastUpdated'), json.dumps(item)))
+        self._db.execute('INSERT OR IGNORE INTO members (root_id, item_id) VALUES (?, ?)', (root_id, item_id))
+        self._db.execute('DELETE FROM files WHERE item_id = ?', (item_id,))
+        self._db.execute('DELETE FROM extents WHERE item_id = ?', (item_id,))
+        files = [(f, None) for f in item.get('files', [])]
+        for facet in item.get('facets', []):
+            files.extend((f, facet.get('name')) for f in facet.get('files', []))
+        self._db.executemany(
+            'INSERT INTO files (item_id, name, content_type, size, checksum, url, facet) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            [(item_id, f.get('name'), f.get('contentType'), f.get('size'),
+              f['checksum'].get('value') if isinstance(f.get('checksum'), dict) else None, f.get('url'), facet)
+             for f, facet in files])
+        self._db.executemany('INSERT INTO extents (item_id, extent_id) VALUES (?, ?)',
+                             [(item_id, str(extent)) for extent in item.get('extents', [])
+                              if not isinstance(extent, dict)])
+
+    def _prune(self, root_id, seen):
+        """Remove the items of a root which were not seen during a full sync"""
+        stale = [item_id for item_id in self.get_item_ids(root_id) if item_id not in seen]
+        for item_id in stale:
+            self._db.execute('DELETE FROM members WHERE root_id = ? AND item_id = ?', (root_id, item_id))
+            if not self._db.execute('SELECT 1 FROM members WHERE item_id = ?', (item_id,)).fetchone():
+                self._db.execute('DELETE FROM items WHERE id = ?', (item_id,))
+                self._db.execute('DELETE FROM files WHERE item_id = ?', (item_id,))
+                self._db.execute('DELETE FROM extents WHERE item_id = ?', (item_id,))
@@ -0,0 +1,87 @@
+"""ChecksumCache keeps the MD5 checksums of local files in a SQLite database."""
+import os
+import random
+import sqlite3
+import threading
+
+from .checksum import file_md5
+
+
+class ChecksumCache:
+    """ChecksumCache persists the MD5 checksums of local files, keyed on the file's path, size,
+    modification time and inode, so that unchanged files are not hashed again.  Any change to the
+    file's size, modification time or inode makes its cached checksum stale.
+
+    A fraction of cache hits can be verified by hashing the file again, to detect changes which
+    preserve the file's size and modification time.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS checksums (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            inode INTEGER NOT NULL,
+            md5 TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, database, verify_rate=0):
+        """Open (or create) a checksum cache
+
+        :param database: Path of the SQLite database file
+        :param verify_rate: Fraction of cache hits, between 0 and 1, to verify by hashing the file again
+        """
+        self._verify_rate = verify_rate
+        self._db = sqlite3.connect(database, check_same_thread=False)
+        self._db.executescript(self._SCHEMA)
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close the cache database"""
+        self._db.close()
+
+    def get(self, filename, stat=None):
+        """Get the cached checksum of a file
+
+        :param filename: Path of the file
+        :param stat: os.stat() result of the file, if already known
+        :return: Hex digest of the file's MD5 checksum, or None if it is not cached or the file has changed
+        """
+        stat = stat or os.stat(filename)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT md5 FROM checksums WHERE path = ? AND size = ? AND mtime_ns = ? AND inode = ?",
+                (os.path.abspath(filename), stat.st_size, stat.st_mtime_ns, stat.st_ino)).fetchone()
+        return row[0] if row else None
+
+    def put(self, filename, checksum, stat):
+        """Store the checksum of a file
+
+        :param filename: Path of the file
+        :param checksum: Hex digest of the file's MD5 checksum
+        :param stat: os.stat() result of the file, taken before it was read to compute the checksum
+        """
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO checksums (path, size, mtime_ns, inode, md5) VALUES (?, ?, ?, ?, ?)",
+                             (os.path.abspath(filename), stat.st_size, stat.st_mtime_ns, stat.st_ino, checksum))
+
+    def checksum(self, filename):
+        """Get the checksum of a file, from the cache if the file is unchanged, or else by hashing it
+
+        :param filename: Path of the file
+        :return: Hex digest of the file's MD5 checksum
+        """
+        stat = os.stat(filename)
+        checksum = self.get(filename, stat)
+        if checksum is not None and (not self._verify_rate or random.random() >= self._verify_rate):
+            return checksum
+        checksum = file_md5(filename)
+        self.put(filename, checksum, stat)
+        return checksum
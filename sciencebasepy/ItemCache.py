@@ -0,0 +1,88 @@
+"""ItemCache provides an in-memory cache of ScienceBase Catalog Items by ID."""
+from collections import OrderedDict
+import json
+import threading
+import time
+
+
+class ItemCache:
+    """ItemCache holds ScienceBase Catalog Item JSON by item ID, along with the item's lastUpdated
+    version and the time it was fetched.  The least recently used items are evicted once max_items
+    is reached.
+    """
+
+    def __init__(self, max_items=10000):
+        """Create an item cache
+
+        :param max_items: Maximum number of items to hold
+        """
+        self._max_items = max_items
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, item_id):
+        return item_id in self._entries
+
+    def get(self, item_id, max_age=None):
+        """Get a cached item
+
+        :param item_id: ScienceBase Catalog Item ID
+        :param max_age: Maximum time since the item was fetched or confirmed current, in seconds, or None for any age
+        :return: Copy of the ScienceBase Catalog Item JSON, or None if the item is not cached or is too old
+        """
+        with self._lock:
+            entry = self._entries.get(item_id)
+            if entry is None or (max_age is not None and time.time() - entry[2] > max_age):
+                return None
+            self._entries.move_to_end(item_id)
+            return json.loads(entry[0])
+
+    def get_version(self, item_id):
+        """Get the lastUpdated version of a cached item
+
+        :param item_id: ScienceBase Catalog Item ID
+        :return: lastUpdated date string of the cached item, or None if the item is not cached or has no version
+        """
+        with self._lock:
+            entry = self._entries.get(item_id)
+        return entry[1] if entry else None
+
+    def put(self, item):
+        """Cache an item as fetched now
+
+        :param item: ScienceBase Catalog Item JSON
+        """
+        if not isinstance(item, dict) or 'id' not in item:
+            return
+        with self._lock:
+            self._entries[item['id']] = (json.dumps(item), item.get('lastUpdated'), time.time())
+            self._entries.move_to_end(item['id'])
+            while len(self._entries) > self._max_items:
+                self._entries.popitem(last=False)
+
+    def touch(self, item_id):
+        """Record that a cached item was confirmed current now
+
+        :param item_id: ScienceBase Catalog Item ID
+        """
+        with self._lock:
+            entry = self._entries.get(item_id)
+            if entry is not None:
+                self._entries[item_id] = (entry[0], entry[1], time.time())
+
+    def invalidate(self, item_ids):
+        """Remove items from the cache
+
+        :param item_ids: List of ScienceBase Catalog Item IDs
+        """
+        with self._lock:
+            for item_id in item_ids:
+                self._entries.pop(item_id, None)
+
+    def clear(self):
+        """Remove all cached items"""
+        with self._lock:
+            self._entries.clear()
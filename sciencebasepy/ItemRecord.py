@@ -0,0 +1,95 @@
+"""Compact, read-only records of ScienceBase Catalog Items for bulk reads."""
+import json
+import keyword
+
+
+class _EncodedJSON(str):
+    """Nested item JSON (e.g. files, facets, extents) held in its compact serialized form"""
+    __slots__ = ()
+
+
+class ItemRecord:
+    """ItemRecord is the base class of compact item records.  Each record type holds a fixed set of
+    item fields in __slots__ rather than a dictionary.  Nested values such as files, facets and extents
+    are kept serialized and only decoded when the attribute is accessed.
+
+    Use record_type() to get the record type for a set of fields.
+    """
+    __slots__ = ()
+    _fields = ()
+
+    @classmethod
+    def from_json(cls, item):
+        """Create a record from ScienceBase Catalog Item JSON
+
+        :param item: ScienceBase Catalog Item JSON
+        :return: Record holding the record type's fields of the item
+        """
+        record = cls.__new__(cls)
+        for field in cls._fields:
+            value = item.get(field)
+            if isinstance(value, (dict, list)):
+                value = _EncodedJSON(json.dumps(value, separators=(',', ':')))
+            object.__setattr__(record, '_' + field, value)
+        return record
+
+    def __getitem__(self, field):
+        if field not in self._fields:
+            raise KeyError(field)
+        return getattr(self, field)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ItemRecord is read-only")
+
+    def __repr__(self):
+        return '%s(%s)' % (type(self).__name__, ', '.join(
+            '%s=%r' % (field, getattr(self, '_' + field)) for field in self._fields))
+
+    def get(self, field, default=None):
+        """Get the value of a field, or the default if the field is not held or not set
+
+        :param field: Item field name
+        :param default: Value to return if the field is not held or not set
+        :return: Value of the field
+        """
+        value = getattr(self, field, None) if field in self._fields else None
+        return default if value is None else value
+
+    def to_json(self):
+        """Get the item JSON of the record
+
+        :return: Dictionary of the fields held by the record which are set
+        """
+        return {field: getattr(self, field) for field in self._fields if getattr(self, '_' + field) is not None}
+
+
+def _decoding_property(field):
+    """Create the property reading a record field, decoding nested JSON on access"""
+    slot = '_' + field
+
+    def _get(self):
+        value = getattr(self, slot)
+        return json.loads(value) if isinstance(value, _EncodedJSON) else value
+    return property(_get, doc="The item's %s" % field)
+
+
+_record_types = {}
+
+
+def record_type(fields):
+    """Get the record type holding the given item fields.  The id field is always included.
+
+    :param fields: Comma-separated string or list of item field names, e.g. 'title,files'
+    :return: ItemRecord subclass
+    """
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    fields = tuple(dict.fromkeys(['id'] + [field.strip() for field in fields if field.strip()]))
+    if fields not in _record_types:
+        for field in fields:
+            if not field.isidentifier() or keyword.iskeyword(field) or hasattr(ItemRecord, field):
+                raise ValueError("Invalid item field name: " + field)
+        namespace = {'__slots__': tuple('_' + field for field in fields), '_fields': fields}
+        namespace.update({field: _decoding_property(field) for field in fields})
+        _record_types[fields] = type('ItemRecord', (ItemRecord,), namespace)
+    return _record_types[fields]
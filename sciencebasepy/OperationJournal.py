@@ -0,0 +1,128 @@
+"""OperationJournal records SbSession mutations in a write-ahead JSON Lines file, so that interrupted
+sequences of changes can be resumed."""
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import threading
+
+
+class OperationJournal:
+    """OperationJournal is a write-ahead log of SbSession mutations.  Each operation is appended to the
+    journal file before it is sent to ScienceBase, and again with its result once it has completed.
+
+    Operations are identified by an idempotency key derived from the operation name, its arguments and
+    the number of identical operations before it in the current run.  Rerunning the same sequence of
+    operations against the journal therefore skips the operations already completed, returning their
+    recorded results, and only sends the rest.
+    """
+
+    STARTED = 'started'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+
+    def __init__(self, path):
+        """Open a journal, reading any operations already recorded in it
+
+        :param path: Path of the journal file. It is created if it does not exist.
+        """
+        self._path = path
+        self._entries = OrderedDict()
+        self._counts = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Partially written final line from an interrupted run
+                        continue
+                    self._apply(record)
+
+    @property
+    def path(self):
+        """Path of the journal file"""
+        return self._path
+
+    def __len__(self):
+        return len(self._entries)
+
+    def next_key(self, op, args):
+        """Get the idempotency key of the next call of an operation
+
+        :param op: Operation name, e.g. 'create_item'
+        :param args: List of the JSON serializable arguments of the operation
+        :return: Idempotency key
+        """
+        digest = hashlib.sha1(json.dumps([op, args], sort_keys=True).encode('utf-8')).hexdigest()
+        with self._lock:
+            count = self._counts.get(digest, 0)
+            self._counts[digest] = count + 1
+        return '%s:%s:%d' % (op, digest, count)
+
+    def get(self, key):
+        """Get a recorded operation
+
+        :param key: Idempotency key
+        :return: Dictionary with the key, op, args and state of the operation, plus its result if completed or
+        its error if failed, or None if the operation is not recorded
+        """
+        return self._entries.get(key)
+
+    def is_completed(self, key):
+        """Whether an operation has completed
+
+        :param key: Idempotency key
+        :return: True if the operation is recorded as completed
+        """
+        entry = self._entries.get(key)
+        return entry is not None and entry['state'] == self.COMPLETED
+
+    def incomplete(self):
+        """Get the operations which were started but did not complete, in the order they were started
+
+        :return: List of operation dictionaries, as returned by get()
+        """
+        return [entry for entry in self._entries.values() if entry['state'] != self.COMPLETED]
+
+    def begin(self, key, op, args):
+        """Record that an operation is about to be sent
+
+        :param key: Idempotency key
+        :param op: Operation name
+        :param args: List of the JSON serializable arguments of the operation
+        """
+        self._append({'key': key, 'op': op, 'args': args, 'state': self.STARTED})
+
+    def complete(self, key, result):
+        """Record that an operation has completed
+
+        :param key: Idempotency key
+        :param result: JSON serializable result of the operation
+        """
+        self._append({'key': key, 'state': self.COMPLETED, 'result': result})
+
+    def fail(self, key, error):
+        """Record that an operation has failed
+
+        :param key: Idempotency key
+        :param error: Exception or error message
+        """
+        self._append({'key': key, 'state': self.FAILED, 'error': str(error)})
+
+    def _append(self, record):
+        """Append a record to the journal file, syncing it to disk"""
+        with self._lock:
+            with open(self._path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self._apply(record)
+
+    def _apply(self, record):
+        """Update the state of an operation from a journal record"""
+        entry = self._entries.setdefault(record['key'], {'key': record['key']})
+        entry.update(record)
+        if record['state'] != self.FAILED:
+            entry.pop('error', None)
@@ -0,0 +1,136 @@
+"""ResponseCache provides an in-memory cache of ScienceBase JSON responses."""
+from collections import OrderedDict
+from urllib.parse import urlencode
+import urllib.parse as urlparse
+import threading
+import time
+
+
+class CacheEntry:
+    """A cached ScienceBase response"""
+    __slots__ = ('url', 'text', 'expires', 'etag', 'last_modified')
+
+    def __init__(self, url, text, expires, etag=None, last_modified=None):
+        self.url = url
+        self.text = text
+        self.expires = expires
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def is_fresh(self):
+        """Whether the entry may be used without checking with ScienceBase"""
+        return time.time() < self.expires
+
+    def conditional_headers(self):
+        """Headers asking ScienceBase whether the entry is still current
+
+        :return: Dictionary of If-None-Match/If-Modified-Since headers, empty if the entry cannot be revalidated
+        """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """ResponseCache holds the text of ScienceBase JSON responses keyed by normalized URL and query
+    parameters.  The least recently used entries are evicted once max_entries is reached, and entries
+    expire after a time to live which may be set per endpoint.
+    """
+
+    def __init__(self, max_entries=1000, ttl=300, ttls=None):
+        """Create a response cache
+
+        :param max_entries: Maximum number of responses to hold
+        :param ttl: Default time to live of a response, in seconds
+        :param ttls: Dictionary of time to live, in seconds, by ScienceBase Catalog endpoint, e.g.
+        {'item': 600, 'items': 60} for item reads and searches
+        """
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._ttls = ttls if ttls else {}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key(self, url, params=None):
+        """Build the cache key for a request
+
+        :param url: URL of the request
+        :param params: Query parameters of the request
+        :return: The URL with all query parameters merged and sorted
+        """
+        o = urlparse.urlsplit(url)
+        query = urlparse.parse_qsl(o.query, keep_blank_values=True)
+        for name, value in (params or {}).items():
+            if isinstance(value, (list, tuple)):
+                query.extend((name, str(v)) for v in value)
+            elif value is not None:
+                query.append((name, str(value)))
+        return urlparse.urlunsplit((o.scheme, o.netloc, o.path, urlencode(sorted(query)), ''))
+
+    def get(self, key):
+        """Get a cached response, whether or not it has expired
+
+        :param key: Cache key of the request
+        :return: CacheEntry, or None if the response is not cached
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, text, etag=None, last_modified=None):
+        """Cache a response
+
+        :param key: Cache key of the request
+        :param text: Text of the JSON response
+        :param etag: ETag header of the response
+        :param last_modified: Last-Modified header of the response
+        """
+        entry = CacheEntry(key, text, time.time() + self._get_ttl(key), etag, last_modified)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def refresh(self, entry):
+        """Restart the time to live of an entry which ScienceBase confirmed is still current
+
+        :param entry: CacheEntry to refresh
+        """
+        entry.expires = time.time() + self._get_ttl(entry.url)
+
+    def invalidate(self, item_ids):
+        """Remove the cached responses concerning the given items.  Cached searches are also removed, as
+        their results may include the items.
+
+        :param item_ids: List of ScienceBase Catalog Item IDs
+        """
+        item_ids = [item_id for item_id in item_ids if item_id]
+        with self._lock:
+            for key in list(self._entries):
+                if self._endpoint(key) == 'items' or any(item_id in key for item_id in item_ids):
+                    del self._entries[key]
+
+    def clear(self):
+        """Remove all cached responses"""
+        with self._lock:
+            self._entries.clear()
+
+    def _get_ttl(self, key):
+        """Get the time to live, in seconds, of the response for a cache key"""
+        return self._ttls.get(self._endpoint(key), self._ttl)
+
+    def _endpoint(self, key):
+        """Get the ScienceBase Catalog endpoint of a cache key, e.g. 'item' or 'items'"""
+        path = urlparse.urlsplit(key).path
+        if '/catalog/' in path:
+            path = path.split('/catalog/', 1)[1]
+        return path.strip('/').split('/')[0]
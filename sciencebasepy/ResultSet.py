@@ -0,0 +1,102 @@
+"""ResultSet provides random access to the results of a ScienceBase Catalog search."""
+from collections import OrderedDict
+
+
+class ResultSet:
+    """ResultSet gives random access to the items of a ScienceBase Catalog search.  Pages are requested
+    directly by offset, rather than by walking the nextlinks from the first page, and the most recently
+    used pages are kept for reuse.
+
+    Supports len(), indexing, slicing and iteration, e.g. results[5000:5010].
+    """
+
+    def __init__(self, sb_session, params, page_size=None, max_cached_pages=10):
+        """Create a result set for a search
+
+        :param sb_session: SbSession used to run the search
+        :param params: ScienceBase Catalog search parameters
+        :param page_size: Number of items per page. Defaults to the 'max' search parameter, or 1000, which is also
+        the maximum.
+        :param max_cached_pages: Maximum number of pages kept in memory
+        """
+        self._sb_session = sb_session
+        self._params = dict(params)
+        self._params.pop('offset', None)
+        # ScienceBase returns at most _max_item_count items per page
+        self._page_size = min(int(page_size or self._params.get('max', sb_session._max_item_count)),
+                              sb_session._max_item_count)
+        self._params['max'] = self._page_size
+        self._max_cached_pages = max(1, max_cached_pages)
+        self._pages = OrderedDict()
+        self._total = None
+
+    @property
+    def total(self):
+        """Total number of items matching the search"""
+        if self._total is None:
+            self.page(0)
+        return self._total
+
+    @property
+    def page_size(self):
+        """Number of items per page"""
+        return self._page_size
+
+    @property
+    def page_count(self):
+        """Number of pages in the result set"""
+        return (self.total + self._page_size - 1) // self._page_size
+
+    def __len__(self):
+        return self.total
+
+    def __iter__(self):
+        for n in range(self.page_count):
+            for item in self.page(n):
+                yield item
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            ret = []
+            for n in range(start // self._page_size, (stop - 1) // self._page_size + 1 if stop > start else 0):
+                page_start = n * self._page_size
+                ret.extend(self.page(n)[max(start - page_start, 0):stop - page_start])
+            return ret
+        if index < 0:
+            index += len(self)
+            if index < 0:
+                raise IndexError("ResultSet index out of range")
+        # Request the page holding the index directly, before the total is known
+        page = self.page(index // self._page_size)
+        offset = index % self._page_size
+        if offset >= len(page):
+            raise IndexError("ResultSet index out of range")
+        return page[offset]
+
+    def page(self, n):
+        """Get a page of the results
+
+        :param n: Page number, starting at 0
+        :return: List of ScienceBase Catalog Item JSON on the page
+        """
+        if n in self._pages:
+            self._pages.move_to_end(n)
+            return self._pages[n]
+        response = self._sb_session.find_items(dict(self._params, offset=n * self._page_size))
+        items = response.get('items', []) if response else []
+        if response and 'total' in response:
+            self._total = response['total']
+        elif self._total is None:
+            self._total = n * self._page_size + len(items)
+        self._pages[n] = items
+        while len(self._pages) > self._max_cached_pages:
+            self._pages.popitem(last=False)
+        return items
+
+    def clear(self):
+        """Discard the cached pages and total"""
+        self._pages.clear()
+        self._total = None
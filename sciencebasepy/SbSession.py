@@ -11,8 +11,12 @@ import json
 import os
 import getpass
 import requests
+import urllib3
 import hashlib
 import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 # from pkg_resources import get_distribution
 # from pkg_resources import DistributionNotFound
@@ -22,6 +26,19 @@ from importlib.metadata import version, PackageNotFoundError
 from sb3.SbSessionEx import SbSessionEx
 from sb3 import client
 
+from .ResponseCache import ResponseCache
+from .ItemCache import ItemCache
+from .ItemRecord import record_type
+from .jsonstream import iter_json_array
+from .ResultSet import ResultSet
+from .bulk import BulkResult, RateLimiter, chunk_files, chunk_items, chunk_payload
+from .geometry import reduce_feature
+from .TrackedItem import TrackedItem
+from .OperationJournal import OperationJournal
+from .checksum import checksum_many, file_md5
+from .ChecksumCache import ChecksumCache
+from .multipart import MultipartEncoder
+
 class SbSession:
     """SbSession encapsulates a session with ScienceBase, and provides methods for working with
     ScienceBase Catalog Items.
@@ -45,9 +62,21 @@ class SbSession:
     _session = None
     _retry = False
     _max_item_count = 1000
+    _max_ids_per_query = 100
+    _max_bulk_bytes = 5000000
+    _max_upload_batch_bytes = 100000000
+    _max_temp_upload_bytes = 5000000
+    _max_buffered_upload_bytes = 8000000
     _env = None
     _sbSessionEx = None
     _refresh_time_limit = 600
+    _cache = None
+    _item_cache = None
+    _item_cache_max_age = None
+    _journal = None
+    _journal_create_ops = ('create_item', 'create_item_link')
+    _checksum_cache = None
+    _owns_checksum_cache = False
 
     def __init__(self, env=None):
         """Initialize session and set JSON headers"""
@@ -82,6 +111,9 @@ class SbSession:
 
         self._session = requests.Session()
         self._session.headers.update({'Accept': 'application/json'})
+        self._journal_state = threading.local()
+        self._upload_buffer_lock = threading.Lock()
+        self._buffered_upload_bytes = 0
         sciencebasepy_agent = ' sciencebase-sciencebasepy'
         try:
             sciencebasepy_agent += f'/{version("sciencebasepy")}'
@@ -214,15 +246,163 @@ class SbSession:
         """
         return self.get_json(self._base_sb_url + 'jossoHelper/sessionInfo?includeJossoSessionId=true')
 
-    def get_item(self, itemid, params=None):
+    def get_item(self, itemid, params=None, max_age=None):
         """Get the ScienceBase Item JSON with the given ID
         
         :param params: Allows you to specify query params, such as {'fields':'title,ancestors'} for ?fields=title,ancestors
+        :param max_age: When the item cache is enabled, the maximum age in seconds of a cached item which may be
+        returned without checking ScienceBase. Use 0 to always get the current item, and None for the cache default.
         :return: JSON for the ScienceBase Item with the given ID
         """
         self._refresh_check()
-        ret = self._session.get(self._base_item_url + itemid, params=params)
-        return self._get_json(ret)
+        if self._item_cache is None or params:
+            return self._get_json_cached(self._base_item_url + itemid, params)
+        max_age = self._item_cache_max_age if max_age is None else max_age
+        item = self._item_cache.get(itemid, max_age)
+        if item is not None:
+            return item
+        # Revalidate with ScienceBase itself, never with the response cache, which may be older than max_age
+        version = self._item_cache.get_version(itemid)
+        if version is not None and max_age != 0:
+            # Only fetch the full item if its version has changed
+            current = self._get_json(self._session.get(self._base_item_url + itemid, params={'fields': 'lastUpdated'}))
+            if current.get('lastUpdated') == version:
+                self._item_cache.touch(itemid)
+                return self._item_cache.get(itemid)
+        item = self._get_json(self._session.get(self._base_item_url + itemid))
+        self._item_cache.put(item)
+        return item
+
+    def enable_item_cache(self, max_items=10000, max_age=60):
+        """Cache ScienceBase Items by ID for get_item().  A cached item older than max_age is only fetched
+        again if its lastUpdated version has changed.  Items updated, uploaded to or moved through this
+        session are replaced in the cache by the returned item JSON, and deleted items are removed.
+
+        :param max_items: Maximum number of items to cache. The least recently used are evicted first.
+        :param max_age: Default maximum age in seconds of a cached item which get_item() may return without checking ScienceBase
+        :return: The SbSession object
+        """
+        self._item_cache = ItemCache(max_items)
+        self._item_cache_max_age = max_age
+        return self
+
+    def disable_item_cache(self):
+        """Stop caching items, discarding any cached items"""
+        self._item_cache = None
+
+    def enable_journal(self, journal):
+        """Record item creation, updates, moves, links and ACL changes made through this session in a
+        write-ahead journal.  Each call is journaled before it is sent and again once it completes, keyed by an
+        idempotency key.  Rerunning a script against the same journal returns the recorded results of the calls
+        already completed instead of sending them again.
+
+        :param journal: OperationJournal, or the path of its JSON Lines file
+        :return: The SbSession object
+        """
+        self._journal = self._open_journal(journal)
+        return self
+
+    def disable_journal(self):
+        """Stop journaling calls"""
+        self._journal = None
+
+    def resume(self, journal):
+        """Replay the journaled calls which did not complete, in the order they were started.  Calls which were
+        sent but whose completion was not recorded are sent again, except for calls creating items or links: these
+        may have succeeded before the run was interrupted, and sending them again would create duplicates, so they
+        are reported as failed for the caller to check in ScienceBase.  If the journal is the session's own
+        journal file, the session's journal records the replayed calls.
+
+        :param journal: OperationJournal, or the path of its JSON Lines file
+        :return: BulkResult with the result of each replayed call, keyed by idempotency key
+        """
+        self._refresh_check()
+        journal = self._open_journal(journal)
+        result = BulkResult()
+        for entry in journal.incomplete():
+            if entry['op'] in self._journal_create_ops and entry['state'] == OperationJournal.STARTED:
+                result.add_failure(entry['key'], "%s was sent but its result was not recorded, so it may already have "
+                                                 "been applied; check ScienceBase before repeating it" % entry['op'])
+                continue
+            method = getattr(self, entry['op'])
+            try:
+                result.add_success(entry['key'], self._run_journaled(journal, entry['key'], entry['op'], entry['args'],
+                                                                     lambda: method(*entry['args'])))
+            except Exception as exc:
+                result.add_failure(entry['key'], exc)
+        return result
+
+    def _open_journal(self, journal):
+        """Get the OperationJournal for a journal or journal file, reusing the session's journal if it is the
+        same file, so that a journal file is never written through two OperationJournals
+
+        :param journal: OperationJournal, or the path of its JSON Lines file
+        :return: OperationJournal
+        """
+        path = journal.path if isinstance(journal, OperationJournal) else journal
+        if self._journal is not None and os.path.abspath(self._journal.path) == os.path.abspath(path):
+            return self._journal
+        return journal if isinstance(journal, OperationJournal) else OperationJournal(path)
+
+    def _journaled(self, op, args, func):
+        """Call a mutation, recording it in the journal if journaling is enabled.  Calls made while another
+        journaled call is running, e.g. set_permissions() within _update_acls(), are not journaled separately.
+
+        :param op: Name of the SbSession method, used to replay the call
+        :param args: List of the JSON serializable arguments of the method
+        :param func: Function making the call
+        :return: The return value of the function, or the recorded result if the call already completed
+        """
+        if self._journal is None or getattr(self._journal_state, 'depth', 0):
+            return func()
+        return self._run_journaled(self._journal, self._journal.next_key(op, args), op, args, func)
+
+    def _run_journaled(self, journal, key, op, args, func):
+        """Call a mutation under the given idempotency key, recording it in a journal
+
+        :param journal: OperationJournal
+        :param key: Idempotency key
+        :param op: Name of the SbSession method
+        :param args: List of the JSON serializable arguments of the method
+        :param func: Function making the call
+        :return: The return value of the function, or the recorded result if the call already completed
+        """
+        if journal.is_completed(key):
+            return journal.get(key)['result']
+        journal.begin(key, op, args)
+        self._journal_state.depth = getattr(self._journal_state, 'depth', 0) + 1
+        try:
+            ret = func()
+        except Exception as exc:
+            journal.fail(key, exc)
+            raise
+        finally:
+            self._journal_state.depth -= 1
+        journal.complete(key, ret)
+        return ret
+
+    def get_items(self, ids, fields=None, max_workers=4):
+        """Get multiple ScienceBase Items by ID.  The IDs are grouped into search queries which run
+        concurrently, rather than requesting each item separately.
+
+        :param ids: List of ScienceBase Catalog Item IDs
+        :param fields: Comma-separated item fields to return, e.g. 'title,files'. By default, the
+        fields returned by find_items are returned.
+        :param max_workers: Maximum number of concurrent search requests
+        :return: Dictionary of ScienceBase Catalog Item JSON keyed by item ID, in the order of the given IDs.
+        The value is None for each item which was not found or is not accessible.
+        """
+        self._refresh_check()
+        ids = list(dict.fromkeys(ids))
+        params = {'fields': fields} if fields else {}
+        batches = [ids[i:i + self._max_ids_per_query] for i in range(0, len(ids), self._max_ids_per_query)]
+
+        found = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for items in executor.map(lambda batch: self._find_all_pages(self._ids_params(params, batch)), batches):
+                for item in items:
+                    found[item['id']] = item
+        return {item_id: found.get(item_id) for item_id in ids}
 
     def get_hidden_properties(self, item_id):
         """Get the list of all hidden properties for a ScienceBase Item
@@ -267,43 +447,56 @@ class SbSession:
         """Search for ScienceBase items by filter and hidden property
 
         Warning: Because of the way hidden property results must be joined to ScienceBase Catalog search results,
-        this method returns all matching items. Queries returning too many items may be blocked by ScienceBase.
+        this method returns all matching items. Use iter_items_by_filter_and_hidden_property() to process the
+        matching items as they are retrieved.
 
         :param params: ScienceBase Catalog search parameters
         :param hidden_property: ScienceBase Item Hidden Property JSON: {"type": ..., "value": ...}
-        :return: ScienceBase Catalog search response object containing the first page of results for the search
+        :return: List of ScienceBase Catalog Item JSON for all matching items
+        """
+        return list(self.iter_items_by_filter_and_hidden_property(params, hidden_property))
+
+    def iter_items_by_filter_and_hidden_property(self, params, hidden_property):
+        """Iterate over ScienceBase items matching both a search and a hidden property.  The IDs of the
+        items carrying the hidden property are sent to ScienceBase in chunks along with the search
+        parameters, so only matching items are retrieved.
+
+        :param params: ScienceBase Catalog search parameters
+        :param hidden_property: ScienceBase Item Hidden Property JSON: {"type": ..., "value": ...}
+        :return: Generator yielding ScienceBase Catalog Item JSON, with the matching properties in "hiddenProperties"
         """
         #
-        # Retrieve all of the hidden property results 
+        # Retrieve all of the hidden property results, mapping properties to their item
         #
         self._refresh_check()
-        ret = []
-        properties = []
-        
+        item_props = {}
         response = self.find_hidden_property(hidden_property)
         while response and "itemHiddenProperties" in response:
-            for item_hidden_property in response["itemHiddenProperties"]:
-                properties.append(item_hidden_property)
+            for prop in response["itemHiddenProperties"]:
+                item_props.setdefault(prop["itemId"], {})[prop["type"]] = prop["value"]
             response = self.next(response)
         #
-        # Save a list of all the ScienceBase Item IDs found, and map properties to their item
+        # Now perform the ScienceBase Item search part of the query, restricted to the items
+        # found above
         #
-        ids = []
-        item_props = {}
-        for prop in properties:
-            ids.append(prop["itemId"])
-            item_props[prop["itemId"]] = {prop["type"]: prop["value"]}
-        #
-        # Now perform the ScienceBase Item search part of the query, saving only Items whose
-        # ID is in the list of matching hidden property items
-        #
-        response = self.find_items(params)
-        while response and "items" in response and response["items"]:
-            for item in response["items"]:
-                if item["id"] in ids:
+        ids = list(item_props)
+        for i in range(0, len(ids), self._max_ids_per_query):
+            for item in self.iter_items(self._ids_params(params, ids[i:i + self._max_ids_per_query])):
+                if item["id"] in item_props:
                     item["hiddenProperties"] = item_props[item["id"]]
-                    ret.append(item)
-            response = self.next(response)
+                    yield item
+
+    def _ids_params(self, params, ids):
+        """Return a copy of the search parameters restricted to the given Item IDs
+
+        :param params: ScienceBase Catalog search parameters
+        :param ids: List of ScienceBase Catalog Item IDs
+        :return: Copy of the search parameters including a query on the item IDs
+        """
+        ret = dict(params)
+        ids_query = 'id:(' + ' OR '.join('"%s"' % item_id for item_id in ids) + ')'
+        ret['lq'] = '(%s) AND %s' % (ret['lq'], ids_query) if ret.get('lq') else ids_query
+        ret.setdefault('max', self._max_item_count)
         return ret
 
     def get_item_ids_by_hidden_property(self, hidden_property):
@@ -325,8 +518,12 @@ class SbSession:
         :return: Full item JSON from ScienceBase Catalog after creation
         """
         self._refresh_check()
-        ret = self._session.post(self._base_item_url, data=json.dumps(item_json))
-        return self._get_json(ret)
+
+        def _create():
+            ret = self._session.post(self._base_item_url, data=json.dumps(item_json))
+            self._invalidate_cache(item_json.get('parentId'))
+            return self._get_json(ret)
+        return self._journaled('create_item', [item_json], _create)
 
     def create_items(self, items_json):
         """Create new Items in ScienceBase
@@ -336,6 +533,7 @@ class SbSession:
         """
         self._refresh_check()
         ret = self._session.post(self._base_items_url + "upsert/", data=json.dumps(items_json))
+        self._invalidate_cache(*[item.get('id') or item.get('parentId') for item in items_json])
         return self._get_json(ret)
 
     def create_hidden_property(self, item_id, hidden_property_json):
@@ -347,6 +545,7 @@ class SbSession:
         """
         self._refresh_check()
         ret = self._session.post(self._base_item_url + item_id + '/hiddenProperties/', data=json.dumps(hidden_property_json))
+        self._invalidate_cache(item_id)
         return self._get_json(ret)
 
     def update_item(self, item_json):
@@ -357,7 +556,46 @@ class SbSession:
         """
         self._refresh_check()
         ret = self._session.put(self._base_item_url + item_json['id'], data=json.dumps(item_json))
-        return self._get_json(ret)
+        self._invalidate_cache(item_json['id'])
+        return self._cache_item(self._get_json(ret))
+
+    def patch_item(self, item_id, changes):
+        """Update only the given top-level fields of an existing ScienceBase Item, rather than sending
+        the full item JSON.  Requires a Keycloak login (login() or add_token()).
+
+        :param item_id: ID of the ScienceBase Item to update
+        :param changes: Dictionary of the item fields to update, e.g. {'title': 'New title'}
+        :return: The GraphQL response JSON
+        """
+        self._refresh_check()
+        if self._sbSessionEx is None:
+            raise Exception("Not logged in")
+        ret = self._sbSessionEx.update_item(item_id, changes)
+        self._invalidate_cache(item_id)
+        return ret
+
+    def get_tracked_item(self, itemid, params=None):
+        """Get the ScienceBase Item JSON with the given ID as a TrackedItem, which remembers the fetched
+        version so that save_item() only sends the fields changed since.
+
+        :param itemid: ID of the ScienceBase Item
+        :param params: Allows you to specify query params, such as {'fields':'title,ancestors'} for ?fields=title,ancestors
+        :return: TrackedItem holding the JSON for the ScienceBase Item with the given ID
+        """
+        return TrackedItem(self.get_item(itemid, params))
+
+    def save_item(self, tracked_item):
+        """Send the top-level fields of a TrackedItem which changed since it was fetched or last saved, using
+        patch_item().  Nothing is sent if no fields changed.
+
+        :param tracked_item: TrackedItem from get_tracked_item()
+        :return: The TrackedItem
+        """
+        changes = tracked_item.changes()
+        if changes:
+            self.patch_item(tracked_item['id'], changes)
+            tracked_item.mark_clean()
+        return tracked_item
 
     def update_hidden_property(self, item_id, hidden_property_id, hidden_property_json):
         """Update an existing hidden property of a ScienceBase Item
@@ -369,6 +607,7 @@ class SbSession:
         """
         self._refresh_check()
         ret = self._session.put(self._base_item_url + item_id + '/hiddenProperties/' + hidden_property_id, data=json.dumps(hidden_property_json))
+        self._invalidate_cache(item_id)
         return self._get_json(ret)
 
     def update_items(self, items_json):
@@ -378,8 +617,193 @@ class SbSession:
         :return: ScienceBase JSON response
         """
         self._refresh_check()
-        ret = self._session.put(self._base_items_url, data=json.dumps(items_json))
-        return self._get_json(ret)
+
+        def _update():
+            ret = self._session.put(self._base_items_url, data=json.dumps(items_json))
+            self._invalidate_cache(*[item.get('id') for item in items_json])
+            return self._get_json(ret)
+        return self._journaled('update_items', [items_json], _update)
+
+    def update_items_bulk(self, items_json, max_items=100, max_bytes=None, max_workers=4, retries=2):
+        """Update many ScienceBase items, in chunks sent concurrently.  Chunks are limited by item count and
+        serialized size.  Chunks failing with a transient error (connection error, rate limit or server error)
+        are retried.  A chunk rejected because of its content (HTTP 400 or 422) is split in half until the
+        failing items are isolated, so that every item is reported individually; any other error fails the
+        whole chunk.
+
+        :param items_json: List of ScienceBase Catalog Item JSON to update
+        :param max_items: Maximum number of items per request
+        :param max_bytes: Maximum serialized size of a request, in bytes. Defaults to 5 MB.
+        :param max_workers: Maximum number of concurrent requests
+        :param retries: Number of times to retry a chunk after a transient error
+        :return: BulkResult with the updated item JSON of each successful item, keyed by item ID
+        """
+        self._refresh_check()
+        result = BulkResult()
+        chunks = chunk_items(items_json, max_items, max_bytes or self._max_bulk_bytes)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for future in [executor.submit(self._update_chunk, chunk, retries, result) for chunk in chunks]:
+                future.result()
+        return result
+
+    def _update_chunk(self, chunk, retries, result):
+        """Update a chunk of items, recording the outcome of each item
+
+        :param chunk: List of (item, serialized item JSON) tuples from chunk_items()
+        :param retries: Number of times to retry the chunk
+        :param result: BulkResult in which to record the outcome
+        """
+        ids = [item['id'] for item, _ in chunk]
+
+        def _put():
+            ret = self._session.put(self._base_items_url, data=chunk_payload(chunk))
+            self._invalidate_cache(*ids)
+            return self._get_json(ret)
+
+        try:
+            updated = self._call_with_retries(_put, retries)
+        except Exception as exc:
+            # Only an error caused by the items themselves is worth isolating; anything else (authentication,
+            # rate limiting, an unavailable server) would fail the same way for every part of the chunk
+            if len(chunk) > 1 and self._is_item_error(exc):
+                self._update_chunk(chunk[:len(chunk) // 2], 0, result)
+                self._update_chunk(chunk[len(chunk) // 2:], 0, result)
+            else:
+                for item_id in ids:
+                    result.add_failure(item_id, exc)
+            return
+        # Map the response back to the items, by ID where possible
+        updated = updated if isinstance(updated, list) else []
+        by_id = {item['id']: item for item in updated if isinstance(item, dict) and 'id' in item}
+        for i, item_id in enumerate(ids):
+            result.add_success(item_id, by_id.get(item_id, updated[i] if len(updated) == len(ids) else None))
+
+    def ingest_items(self, source, checkpoint_file=None, batch_size=100, max_workers=4, retries=2):
+        """Create or update many ScienceBase items from a JSON Lines file or an iterator of item JSON.  Items
+        are read lazily and sent in batches to upsert concurrently.  When a checkpoint file is given, each
+        committed batch and the IDs returned for it are recorded there, so that rerunning an interrupted
+        ingest of the same source skips the batches already committed instead of creating them again.  The batch
+        size and request size limit are recorded in the checkpoint, since they decide where batches split, and an
+        ingest is not resumed with different ones.
+
+        :param source: Path of a JSON Lines file holding one item JSON per line, or an iterable of item JSON
+        :param checkpoint_file: Path of the checkpoint file to record committed batches in and resume from
+        :param batch_size: Maximum number of items per request
+        :param max_workers: Maximum number of concurrent requests
+        :param retries: Number of times to retry a failed batch. A batch which creates items is only retried if it
+        failed to connect, since it may otherwise have been committed already and a retry would create the items again.
+        :return: BulkResult with the list of item IDs returned for each committed batch, keyed by batch number
+        """
+        self._refresh_check()
+        result = BulkResult()
+        batching = {'batch_size': batch_size, 'max_bytes': self._max_bulk_bytes}
+        committed = {}
+        if checkpoint_file:
+            checkpoint_batching, committed = self._read_checkpoint(checkpoint_file)
+            if checkpoint_batching is None and not committed:
+                with open(checkpoint_file, 'a') as f:
+                    f.write(json.dumps({'batching': batching}) + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+            elif checkpoint_batching != batching:
+                raise Exception("Checkpoint %s was written with batching %s, which does not match %s" % (
+                    checkpoint_file, json.dumps(checkpoint_batching), json.dumps(batching)))
+        for batch_number, ids in committed.items():
+            result.add_success(batch_number, ids)
+        checkpoint_lock = threading.Lock()
+
+        def _upsert(batch_number, chunk):
+            def _post():
+                ret = self._session.post(self._base_items_url + "upsert/", data=chunk_payload(chunk))
+                self._invalidate_cache(*[item.get('id') or item.get('parentId') for item, _ in chunk])
+                return self._get_json(ret)
+            # Updating items by ID is safe to repeat; creating them is not
+            is_retryable = None if all(item.get('id') for item, _ in chunk) else self._is_connect_error
+            try:
+                items = self._call_with_retries(_post, retries, is_retryable)
+            except Exception as exc:
+                result.add_failure(batch_number, exc)
+                return
+            ids = [item.get('id') for item in items] if isinstance(items, list) else []
+            if checkpoint_file:
+                with checkpoint_lock, open(checkpoint_file, 'a') as f:
+                    f.write(json.dumps({'batch': batch_number, 'ids': ids}) + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+            result.add_success(batch_number, ids)
+
+        pending = set()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for batch_number, chunk in enumerate(chunk_items(self._read_items(source), batch_size,
+                                                             self._max_bulk_bytes)):
+                if batch_number in committed:
+                    continue
+                # Bound the number of batches read ahead of the requests
+                if len(pending) >= max_workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                pending.add(executor.submit(_upsert, batch_number, chunk))
+            for future in pending:
+                future.result()
+        return result
+
+    def _read_items(self, source):
+        """Read item JSON lazily from a JSON Lines file or an iterable
+
+        :param source: Path of a JSON Lines file, or an iterable of item JSON
+        :return: Generator yielding ScienceBase Catalog Item JSON
+        """
+        if not isinstance(source, str):
+            for item in source:
+                yield item
+            return
+        with open(source) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def _read_checkpoint(self, checkpoint_file):
+        """Read the batches recorded in an ingest checkpoint file
+
+        :param checkpoint_file: Path of the checkpoint file
+        :return: Tuple of the batching parameters recorded in the checkpoint (or None), and a dictionary of the
+        item IDs of each committed batch, by batch number
+        """
+        batching = None
+        committed = {}
+        if os.path.exists(checkpoint_file):
+            with open(checkpoint_file) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Partially written final line from an interrupted run
+                        continue
+                    if 'batching' in entry:
+                        batching = entry['batching']
+                    else:
+                        committed[entry['batch']] = entry['ids']
+        return batching, committed
+
+    def _call_with_retries(self, func, retries, is_retryable=None):
+        """Call a function, retrying with exponential backoff if it raises a transient error (a connection
+        error, timeout, rate limit or server error)
+
+        :param func: Function to call
+        :param retries: Number of times to retry
+        :param is_retryable: Optional function deciding whether an exception may be retried, in place of
+        _is_transient_error()
+        :return: The return value of the function
+        """
+        for attempt in range(retries):
+            try:
+                return func()
+            except Exception as exc:
+                if not (is_retryable or self._is_transient_error)(exc):
+                    raise
+                time.sleep(2 ** attempt)
+        return func()
 
     def delete_item(self, item_json):
         """Delete an existing ScienceBase Item
@@ -388,6 +812,7 @@ class SbSession:
         :return: True if the item was successfully deleted
         """
         self._refresh_check()
+        self._invalidate_cache(item_json['id'])
         return self._sbSessionEx.delete_item(item_json['id']) 
 
     def delete_hidden_property(self, item_id, hidden_property_id):
@@ -399,6 +824,7 @@ class SbSession:
         """
         self._refresh_check()
         ret = self._session.delete(self._base_item_url + item_id + '/hiddenProperties/' + hidden_property_id)
+        self._invalidate_cache(item_id)
         self._check_errors(ret)
         return True
 
@@ -409,6 +835,7 @@ class SbSession:
         """
         self._refresh_check()
         ret = self._session.post(self._base_undelete_item_url, params={'itemId': itemid})
+        self._invalidate_cache(itemid)
         self._check_errors(ret)
         return self._get_json(ret)
 
@@ -419,14 +846,83 @@ class SbSession:
         :param itemIds: List of Item IDs to delete
         :return: True if the items were successfully deleted
         """
+        result = self.delete_items_bulk(itemIds, retries=0)
+        if not result.ok:
+            raise Exception("Failed to delete %d of %d items: %s" % (
+                len(result.failed), len(itemIds),
+                '; '.join('%s: %s' % (item_id, error) for item_id, error in result.failed.items())))
+        return True
+
+    def delete_items_bulk(self, itemids, cascade=False, max_items=None, max_workers=4, retries=2):
+        """Delete many ScienceBase Items, in chunks sent concurrently.  Chunks failing with a transient error
+        (connection error, rate limit or server error) are retried.  A chunk rejected because of its content
+        (HTTP 400 or 422) is split in half until the failing items are isolated, so that every item is reported
+        individually; any other error fails the whole chunk.  The remaining chunks are still deleted.
+
+        :param itemids: List of ScienceBase Catalog Item IDs to delete
+        :param cascade: Whether to also delete all descendants of the items (excluding shortcutted items).
+        Descendants are deleted level by level, deepest first, and an item is not deleted if any of its
+        descendants could not be.
+        :param max_items: Maximum number of items per request. Defaults to the maximum item count.
+        :param max_workers: Maximum number of concurrent requests
+        :param retries: Number of times to retry a chunk after a transient error
+        :return: BulkResult keyed by item ID
+        """
         self._refresh_check()
-        for i in range(0, len(itemIds), self._max_item_count):
-            ids_json = []
-            for itemId in itemIds[i:i + self._max_item_count]:
-                ids_json.append({'id': itemId})
-            ret = self._session.delete(self._base_items_url, data=json.dumps(ids_json))
+        max_items = max_items or self._max_item_count
+        result = BulkResult()
+        levels = [list(dict.fromkeys(itemids))]
+        paths = {}
+        if cascade:
+            depths = {}
+            for root_id in levels[0]:
+                for node in self.iter_tree(root_id, max_workers=max_workers):
+                    depths[node['id']] = max(node['depth'], depths.get(node['id'], 0))
+                    paths[node['id']] = node['path']
+            levels = [[] for _ in range(max(depths.values(), default=-1) + 1)]
+            for itemid, depth in depths.items():
+                levels[depth].append(itemid)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for level in reversed(levels):
+                blocked = set()
+                for itemid in result.failed:
+                    blocked.update(paths.get(itemid, [])[:-1])
+                for itemid in level:
+                    if itemid in blocked:
+                        result.add_failure(itemid, "A descendant item could not be deleted")
+                level = [itemid for itemid in level if itemid not in blocked]
+                chunks = [level[i:i + max_items] for i in range(0, len(level), max_items)]
+                for future in [executor.submit(self._delete_chunk, chunk, retries, result) for chunk in chunks]:
+                    future.result()
+        return result
+
+    def _delete_chunk(self, ids, retries, result):
+        """Delete a chunk of items, recording the outcome of each item
+
+        :param ids: List of ScienceBase Catalog Item IDs
+        :param retries: Number of times to retry the chunk
+        :param result: BulkResult in which to record the outcome
+        """
+        def _delete():
+            ret = self._session.delete(self._base_items_url, data=json.dumps([{'id': itemid} for itemid in ids]))
+            self._invalidate_cache(*ids)
             self._check_errors(ret)
-        return True
+            if ret.status_code not in (200, 201):
+                raise self._http_error("Other HTTP error: " + str(ret.status_code) + ": " + ret.text, ret)
+
+        try:
+            self._call_with_retries(_delete, retries)
+        except Exception as exc:
+            # Only an error caused by the items themselves is worth isolating
+            if len(ids) > 1 and self._is_item_error(exc):
+                self._delete_chunk(ids[:len(ids) // 2], 0, result)
+                self._delete_chunk(ids[len(ids) // 2:], 0, result)
+            else:
+                for itemid in ids:
+                    result.add_failure(itemid, exc)
+            return
+        for itemid in ids:
+            result.add_success(itemid)
 
     def move_item(self, itemid, parentid):
         """Move an existing ScienceBase Item under a new parent
@@ -436,25 +932,61 @@ class SbSession:
         :return: The JSON of the moved Item
         """
         self._refresh_check()
-        ret = self._session.post(self._base_move_item_url, params={'itemId': itemid, 'destId': parentid})
-        self._check_errors(ret)
-        return self._get_json(ret)
+
+        def _move():
+            ret = self._session.post(self._base_move_item_url, params={'itemId': itemid, 'destId': parentid})
+            self._invalidate_cache(itemid, parentid)
+            self._check_errors(ret)
+            return self._cache_item(self._get_json(ret))
+        return self._journaled('move_item', [itemid, parentid], _move)
 
     def move_items(self, itemids, parentid):
-        """Move ScienceBase Items under a new parent
+        """Move ScienceBase Items under a new parent, using concurrent requests
 
         :param itemids: A list of ScienceBase Catalog Item IDs of the Items to move
         :param parentid: ScienceBase Catalog Item ID of the new parent Item
         :return: A count of the number of Items moved
         """
+        result = self.move_items_bulk(itemids or [], parentid)
+        if not result.ok:
+            raise Exception("Failed to move %d of %d items: %s" % (
+                len(result.failed), len(itemids), ', '.join(result.failed)))
+        return len(result.succeeded)
+
+    def move_items_bulk(self, itemids, parentid, max_workers=4, max_rate=None, progress_callback=None):
+        """Move many ScienceBase Items under a new parent, using concurrent requests.  Failures are recorded
+        rather than stopping the remaining moves.
+
+        :param itemids: A list of ScienceBase Catalog Item IDs of the Items to move
+        :param parentid: ScienceBase Catalog Item ID of the new parent Item
+        :param max_workers: Maximum number of concurrent requests
+        :param max_rate: Maximum number of requests to start per second, or None for no limit
+        :param progress_callback: Optional function called after each move as
+        progress_callback(completed_count, total_count, itemid, error), where error is None on success
+        :return: BulkResult with the JSON of each moved Item, keyed by item ID
+        """
         self._refresh_check()
-        count = 0
-        if itemids:
-            for itemid in itemids:
-                print('moving ' + itemid)
-                self.move_item(itemid, parentid)
-                count += 1
-        return count
+        result = BulkResult()
+        limiter = RateLimiter(max_rate)
+        progress_lock = threading.Lock()
+        completed = [0]
+
+        def _move(itemid):
+            error = None
+            limiter.wait()
+            try:
+                result.add_success(itemid, self.move_item(itemid, parentid))
+            except Exception as exc:
+                error = exc
+                result.add_failure(itemid, exc)
+            if progress_callback:
+                with progress_lock:
+                    completed[0] += 1
+                    progress_callback(completed[0], len(itemids), itemid, error)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(_move, itemids))
+        return result
 
     def upload_file_to_item(self, item, filename, scrape_file=True):
         """Upload a file to an existing Item in ScienceBase
@@ -689,131 +1221,370 @@ class SbSession:
         """
         return self.upload_files_and_upsert_item(item, filenames, scrape_file)
 
-    def upload_files_and_upsert_item(self, item, filenames, scrape_file=True):
-        """Upload multiple files and create or update an Item in ScienceBase
+    def upload_files_and_upsert_item(self, item, filenames, scrape_file=True, progress_callback=None):
+        """Upload multiple files and create or update an Item in ScienceBase.  The request body is streamed,
+        reading each file in large blocks as it is sent, so memory use does not depend on the size of the files.
 
         :param item: ScienceBase Catalog Item JSON of the Item to update
         :param filenames: Filenames of the files to upload
         :param scrape_file: Whether to scrape metadata and create extensions from special files
+        :param progress_callback: Optional function called as the request body is sent, as
+        progress_callback(bytes_sent, total_bytes)
         :return: The ScienceBase Catalog Item JSON of the updated Item
         """
         self._refresh_check()
         url = self._base_upload_file_url
-        checksums = []
         files = []
         params = []
-        for filename in filenames:
-            if isinstance(filename, str):
-                if (os.access(filename, os.F_OK)):
-                    files.append(('file', open(filename, 'rb')))
-                    checksums.append(self.get_file_checksum(filename))  
+        paths = [filename for filename in filenames if isinstance(filename, str)]
+        for filename in paths:
+            if not os.access(filename, os.F_OK):
+                raise Exception("File not found: " + filename)
+        # The checksums are sent in the URL, ahead of the body
+        prepared, buffered_bytes = self._prepare_upload(paths)
+        try:
+            for filename in filenames:
+                if isinstance(filename, str):
+                    files.append(('file', os.path.basename(filename), prepared[filename][0], None))
                 else:
-                    raise Exception("File not found: " + filename)
-            else:
-                files.append(('file', filename))
+                    files.append(('file', None, filename, None))
 
-        data = {'item': json.dumps(item)}
-        params = {} if scrape_file is True else {'scrapeFile':'false'}
-        if 'id' in item and item['id']:
-            data['id'] = item['id']
-            url = '{0}?id={1}&'.format(self._base_upload_file_url, item['id'])
-        else:
-            url = '{0}?'.format(self._base_upload_file_url)
+            data = [('item', json.dumps(item))]
+            params = {} if scrape_file is True else {'scrapeFile':'false'}
+            if 'id' in item and item['id']:
+                data.append(('id', item['id']))
+                url = '{0}?id={1}&'.format(self._base_upload_file_url, item['id'])
+            else:
+                url = '{0}?'.format(self._base_upload_file_url)
 
-        for i, checksum in enumerate(checksums):
-            url += 'md5Checksum={0}'.format(checksum) if i == 0 else '&md5Checksum={0}'.format(checksum)
+            for i, filename in enumerate(paths):
+                checksum = prepared[filename][1]
+                url += 'md5Checksum={0}'.format(checksum) if i == 0 else '&md5Checksum={0}'.format(checksum)
 
-        ret = self._session.post(url, params=params, files=files, data=data)
-        # Close any open files
-        for f in files:
-            f[1].close()
-        return self._get_json(ret)
+            body = MultipartEncoder(data, files, progress_callback)
+            try:
+                ret = self._session.post(url, params=params, data=body, headers={'Content-Type': body.content_type})
+            finally:
+                body.close()
+        finally:
+            self._release_upload_buffer(buffered_bytes)
+            # Close any open files
+            for filename in filenames:
+                if hasattr(filename, 'close'):
+                    filename.close()
+        self._invalidate_cache(item.get('id') or item.get('parentId'))
+        return self._cache_item(self._get_json(ret))
+
+    def sync_directory_to_item(self, local_dir, item_id, delete=False, max_files=100, max_bytes=None,
+                               scrape_file=True, dry_run=False):
+        """Synchronize the files in a local directory to a ScienceBase Item, uploading only the files which are new
+        or have changed.  Local files are compared with the item's files and facet files by name, size and MD5
+        checksum, and are only hashed when their size matches (using the checksum cache if it is enabled).
+
+        Changed files are uploaded to the staging area in batches, and every entry of the same name, in the files list
+        or on a facet, is pointed at the file's upload.  These entries, and the removal of deleted files, are saved in
+        a single item update.  New files are then uploaded to the item in batches.
+
+        :param local_dir: Path of the local directory. Subdirectories are not synchronized.
+        :param item_id: ScienceBase Catalog Item ID of the item to synchronize
+        :param delete: Whether to remove files from the item which are not in the local directory
+        :param max_files: Maximum number of files per upload request
+        :param max_bytes: Maximum total size of the files in an upload request, in bytes. Defaults to 100 MB.
+        :param scrape_file: Whether to scrape metadata and create extensions from new special files
+        :param dry_run: If True, only report what would be changed
+        :return: Dictionary with lists of the names of the 'new', 'changed', 'deleted' and 'unchanged' files,
+        and the updated 'item' JSON (or None for a dry run, or if nothing changed)
+        """
+        self._refresh_check()
+        local_files = {entry.name: entry.path for entry in os.scandir(local_dir) if entry.is_file()}
+        item = self.get_item(item_id, {'fields': 'files,facets'})
+        facets = item.get('facets') or []
+        remote_files = list(item.get('files') or [])
+        for facet in facets:
+            remote_files.extend(facet.get('files') or [])
+        remote = {}
+        for itemfile in remote_files:
+            remote.setdefault(itemfile.get('name'), []).append(itemfile)
+
+        def _checksum(itemfile):
+            checksum = itemfile.get('checksum') or {}
+            return checksum.get('value') if checksum.get('type', 'MD5').upper() == 'MD5' else None
+
+        sizes = {name: os.path.getsize(path) for name, path in local_files.items()}
+        to_hash = [path for name, path in local_files.items()
+                   if any(f.get('size') == sizes[name] and _checksum(f) for f in remote.get(name, []))]
+        checksums = self.checksum_many(to_hash)
+        report = {'new': [], 'changed': [], 'deleted': [], 'unchanged': [], 'item': None}
+        for name in sorted(local_files):
+            if name not in remote:
+                report['new'].append(name)
+            elif any(f.get('size') == sizes[name] and _checksum(f) == checksums.get(local_files[name])
+                     for f in remote[name]):
+                report['unchanged'].append(name)
+            else:
+                report['changed'].append(name)
+        if delete:
+            report['deleted'] = sorted(name for name in remote if name not in local_files)
+        if dry_run:
+            return report
+
+        if report['changed'] or report['deleted']:
+            names = {local_files[name]: name for name in report['changed']}
+            for batch in chunk_files(list(names), max_files, max_bytes or self._max_upload_batch_bytes):
+                ret, checksums = self._upload_temp_files(
+                    batch, [remote[names[filename]][0].get('contentType') for filename in batch])
+                self._check_errors(ret)
+                for filename, upload_json, checksum in zip(batch, ret.json(), checksums):
+                    for itemfile in remote[names[filename]]:
+                        self._point_file_at_upload(itemfile, upload_json, checksum, sizes[names[filename]])
+            deleted = set(report['deleted'])
+            update_json = {'id': item_id, 'files': [f for f in item.get('files') or [] if f.get('name') not in deleted]}
+            if facets:
+                for facet in facets:
+                    if 'files' in facet:
+                        facet['files'] = [f for f in facet['files'] if f.get('name') not in deleted]
+                update_json['facets'] = facets
+            report['item'] = self.update_item(update_json)
+        for batch in chunk_files([local_files[name] for name in report['new']], max_files,
+                                 max_bytes or self._max_upload_batch_bytes):
+            report['item'] = self.upload_files_and_upsert_item({'id': item_id}, batch, scrape_file)
+        return report
+
+    def upload_files_bulk(self, files_by_item, max_files=100, max_bytes=None, max_workers=4, scrape_file=True,
+                          retries=0):
+        """Upload many files to many existing ScienceBase Items.  Each item's files are sent in batches limited by
+        file count and total size, as with upload_files_and_upsert_item(): small files are read into memory up to the
+        session's shared upload buffer, and the rest are opened only while they are being sent, so that thousands of
+        small files can be attached without holding them all open or in memory.  The batches of an item are sent in
+        turn, and the batches of different items are sent concurrently.  An item's remaining batches are not sent
+        once one of its batches fails.
+
+        :param files_by_item: Dictionary of the list of filenames to upload to each item, by item ID
+        :param max_files: Maximum number of files per request
+        :param max_bytes: Maximum total size of the files in a request, in bytes. Defaults to 100 MB.
+        :param max_workers: Maximum number of concurrent requests
+        :param scrape_file: Whether to scrape metadata and create extensions from special files
+        :param retries: Number of times to retry a batch which failed to connect. Other errors are not retried,
+        since the upload may have been committed and a retry would attach the files again.
+        :return: BulkResult with the updated Item JSON of each item, keyed by item ID
+        """
+        self._refresh_check()
+        result = BulkResult()
+        for filenames in files_by_item.values():
+            for filename in filenames:
+                if not os.access(filename, os.F_OK):
+                    raise Exception("File not found: " + filename)
 
-    def upload_file(self, filename, mimetype=None):
+        def _upload(item_id):
+            uploaded = 0
+            for batch in chunk_files(files_by_item[item_id], max_files, max_bytes or self._max_upload_batch_bytes):
+                try:
+                    item = self._call_with_retries(
+                        lambda: self.upload_files_and_upsert_item({'id': item_id}, batch, scrape_file), retries,
+                        self._is_connect_error)
+                except Exception as exc:
+                    result.add_failure(item_id, "%s (%d of %d files uploaded)" % (
+                        exc, uploaded, len(files_by_item[item_id])))
+                    return
+                uploaded += len(batch)
+            result.add_success(item_id, item)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(_upload, [item_id for item_id in files_by_item if files_by_item[item_id]]))
+        return result
+
+    def upload_file(self, filename, mimetype=None, progress_callback=None):
         """ADVANCED USE -- USE OTHER UPLOAD METHODS IF AT ALL POSSIBLE. Upload a file to ScienceBase.  The file will
         be staged in a temporary area.  In order to attach it to an Item, the pathOnDisk must be added to an Item
         files entry, or one of a facet's file entries.
 
         :param filename: File to upload
         :param mimetype: MIME type of the file
+        :param progress_callback: Optional function called as the file is sent, as
+        progress_callback(bytes_sent, total_bytes)
         :return: JSON response from ScienceBase
         """
         self._refresh_check()
-        retval = None
-        url = self._base_upload_file_temp_url
+        return self._upload_temp_file(filename, mimetype, progress_callback)[0]
+
+    def _prepare_upload(self, paths):
+        """Get the checksums of files to upload, and the source to send each one from.  Files fitting in the
+        upload buffer are read into memory once and hashed from there, so they are not read from disk again
+        when sent.  Larger files, and files whose checksum is cached, are streamed from disk.  Files are
+        prepared concurrently.
+
+        The upload buffer is shared by all the uploads of the session, so concurrent uploads together hold at most
+        _max_buffered_upload_bytes in memory.  The bytes reserved must be given back with _release_upload_buffer()
+        once the upload has been sent.
+
+        :param paths: List of file paths
+        :return: Tuple of a dictionary of (source, checksum) tuples by path, where the source is the file's contents
+        or its path, and the number of buffer bytes reserved
+        """
+        buffered = set()
+        reserved = 0
+        with self._upload_buffer_lock:
+            budget = self._max_buffered_upload_bytes - self._buffered_upload_bytes
+            for path in paths:
+                size = os.path.getsize(path)
+                if size <= budget and (self._checksum_cache is None or self._checksum_cache.get(path) is None):
+                    buffered.add(path)
+                    budget -= size
+                    reserved += size
+            self._buffered_upload_bytes += reserved
+
+        def _prepare(path):
+            if path in buffered:
+                return self._read_file_md5(path)
+            return path, self.get_file_checksum(path)
 
-        if os.access(filename, os.F_OK):
-            # if no mimetype was sent in, try to guess
-            if mimetype is None:
-                mimetype = client._guess_mimetype(filename)
-            fname = os.path.basename(filename)
-            checksum = self.get_file_checksum(filename)
-            with open(filename, 'rb') as f:
-                ret = self._session.post(url, params={'md5Checksum': checksum}, files=[('files[]', (fname, f, mimetype))])
-                return ret
-                retval = self._get_json(ret)
-        else:
-            raise Exception("File not found: " + filename)
-        return retval
+        try:
+            with ThreadPoolExecutor(max_workers=min(os.cpu_count() or 1, len(paths)) or 1) as executor:
+                return dict(zip(paths, executor.map(_prepare, paths))), reserved
+        except Exception:
+            self._release_upload_buffer(reserved)
+            raise
+
+    def _release_upload_buffer(self, size):
+        """Give back upload buffer bytes reserved by _prepare_upload()
+
+        :param size: Number of bytes to give back
+        """
+        with self._upload_buffer_lock:
+            self._buffered_upload_bytes -= size
 
-    def replace_file(self, filename, item):
+    def _read_file_md5(self, filename):
+        """Read a file into memory and compute its MD5 checksum from the same read, storing the checksum in
+        the checksum cache if it is enabled
+
+        :param filename: Path of the file
+        :return: Tuple of the file's contents and the hex digest of its MD5 checksum
+        """
+        stat = os.stat(filename)
+        with open(filename, 'rb') as f:
+            data = f.read()
+        checksum = hashlib.md5(data).hexdigest()
+        if self._checksum_cache is not None:
+            self._checksum_cache.put(filename, checksum, stat)
+        return data, checksum
+
+    def _upload_temp_file(self, filename, mimetype=None, progress_callback=None):
+        """Upload a file to the ScienceBase temporary staging area, streaming it from disk
+
+        :param filename: File to upload
+        :param mimetype: MIME type of the file
+        :param progress_callback: Optional function called as the file is sent
+        :return: Tuple of the HTTP response and the MD5 checksum of the file
+        """
+        ret, checksums = self._upload_temp_files([filename], [mimetype], progress_callback)
+        return ret, checksums[0]
+
+    def _upload_temp_files(self, filenames, mimetypes=None, progress_callback=None):
+        """Upload files to the ScienceBase temporary staging area in a single request, streaming them from disk
+
+        :param filenames: List of the files to upload
+        :param mimetypes: List of the MIME type of each file, or None to guess them
+        :param progress_callback: Optional function called as the files are sent
+        :return: Tuple of the HTTP response, whose JSON lists the upload of each file in order, and the list of
+        the MD5 checksums of the files
+        """
+        url = self._base_upload_file_temp_url
+        for filename in filenames:
+            if not os.access(filename, os.F_OK):
+                raise Exception("File not found: " + filename)
+        mimetypes = mimetypes or [None] * len(filenames)
+        prepared, buffered_bytes = self._prepare_upload(filenames)
+        try:
+            files = []
+            for filename, mimetype in zip(filenames, mimetypes):
+                # if no mimetype was sent in, try to guess
+                if mimetype is None:
+                    mimetype = client._guess_mimetype(filename)
+                files.append(('files[]', os.path.basename(filename), prepared[filename][0], mimetype))
+            checksums = [prepared[filename][1] for filename in filenames]
+            body = MultipartEncoder(files=files, progress_callback=progress_callback)
+            try:
+                ret = self._session.post(url, params={'md5Checksum': checksums}, data=body,
+                                         headers={'Content-Type': body.content_type})
+            finally:
+                body.close()
+        finally:
+            self._release_upload_buffer(buffered_bytes)
+        return ret, checksums
+
+    def replace_file(self, filename, item, timeout=600):
         """Replace a file on a ScienceBase Item.  This method will replace all files named
-        the same as the new file, whether they are in the files list or on a facet.
+        the same as the new file, whether they are in the files list or on a facet.  The file is
+        uploaded once and every matching entry is pointed at the upload.  Files larger than 5 MB are
+        uploaded to cloud storage in chunks when logged in to cloud services.
 
         :param filename: Name of the file to replace
         :param item: ScienceBase Catalog Item JSON of the Item on which to replace the file
+        :param timeout: Maximum time in seconds to wait for ScienceBase to complete a cloud upload
         :return: ScienceBase Catalog Item JSON of the updated Item
         """
         self._refresh_check()
         fname = os.path.basename(filename)
-        #
-        # replace file in files list
-        #
-        statinfo = os.stat(filename)
-        if statinfo.st_size > 5000000:
-            print("File is too large.  Large files must be replaced with the UI.")
-        if 'files' in item:
-            new_files = []
-            for f in item['files']:
-                if f['name'] == fname:
-                    f = self._replace_file(filename, f)
-                new_files.append(f)
-            item['files'] = new_files
-        #
-        # replace file in facets
-        #
-        if 'facets' in item:
-            new_facets = []
-            for facet in item['facets']:
-                if 'files' in facet:
-                    new_files = []
-                    for f in facet['files']:
-                        if f['name'] == fname:
-                            f = self._replace_file(filename, f)
-                        new_files.append(f)
-                    facet['files'] = new_files
-                new_facets.append(facet)
-            item['facets'] = new_facets
+        entries = [f for f in item.get('files', []) if f['name'] == fname]
+        for facet in item.get('facets', []):
+            entries.extend(f for f in facet.get('files', []) if f['name'] == fname)
+        if entries:
+            statinfo = os.stat(filename)
+            if statinfo.st_size > self._max_temp_upload_bytes and self._sbSessionEx is not None \
+                    and self._sbSessionEx.is_logged_in():
+                uploaded = self._upload_cloud_replacement(filename, item['id'], entries, timeout)
+                for f in entries:
+                    f.update({k: v for k, v in uploaded.items() if k not in ('name', 'title', 'description')})
+            else:
+                if statinfo.st_size > self._max_temp_upload_bytes:
+                    print(f'{self._username} not logged into Keycloak -- uploading large file without cloud services')
+                ret, checksum = self._upload_temp_file(filename, entries[0].get('contentType'))
+                self._check_errors(ret)
+                upload_json = ret.json()[0]
+                for f in entries:
+                    self._point_file_at_upload(f, upload_json, checksum, statinfo.st_size)
         self.update_item(item)
         return item
 
-    def _replace_file(self, filename, itemfile):
-        """Upload a file to ScienceBase and update file json with new path on disk.
+    def _upload_cloud_replacement(self, filename, item_id, entries, timeout):
+        """Upload a file to cloud storage in chunks, and wait for ScienceBase to record the new upload
 
-        :param filename: Name of the file to replace
-        :param itemfile: ScienceBase Catalog ItemFile JSON
-        :return: ScienceBase Catalog ItemFile JSON after the replace
+        :param filename: Name of the file to upload
+        :param item_id: ScienceBase Catalog Item ID of the Item on which the file is replaced
+        :param entries: ScienceBase Catalog ItemFile JSON of the entries being replaced
+        :param timeout: Maximum time in seconds to wait for ScienceBase to complete the upload
+        :return: ScienceBase Catalog ItemFile JSON of the uploaded file
         """
-        #
-        # Upload file and point file JSON at it
-        #
-        self._refresh_check()
-        upld_json = self.upload_file(filename, itemfile['contentType']).json()
-        itemfile['pathOnDisk'] = upld_json[0]['fileKey']
-        itemfile['dateUploaded'] = upld_json[0]['dateUploaded']
-        itemfile['uploadedBy'] = upld_json[0]['uploadedBy']
-        itemfile['checksum']= {'value': self.get_file_checksum(filename), 'type': 'MD5'}
+        fname = os.path.basename(filename)
+        previous = set(f.get('dateUploaded') for f in entries)
+        response = self._sbSessionEx.upload_cloud_file_upload_session(item_id, filename, entries[0].get('contentType'))
+        if not ('data' in response and 'completeMultiPartUpload' in response['data'] and
+                'Successful' in response['data']['completeMultiPartUpload']):
+            raise Exception('Cloud upload failed for ' + filename)
+        deadline = time.time() + timeout
+        while True:
+            self._invalidate_cache(item_id)
+            for f in self.get_item(item_id, {'fields': 'files'}).get('files', []):
+                if f.get('name') == fname and f.get('pathOnDisk') and f.get('dateUploaded') not in previous:
+                    return f
+            if time.time() > deadline:
+                raise Exception('Timed out waiting for ScienceBase to complete the upload of ' + filename)
+            time.sleep(3)
+
+    def _point_file_at_upload(self, itemfile, upload_json, checksum, size):
+        """Update file json with the path on disk, checksum and size of an uploaded file
 
+        :param itemfile: ScienceBase Catalog ItemFile JSON
+        :param upload_json: JSON of the uploaded file, from the upload response
+        :param checksum: MD5 checksum of the uploaded file
+        :param size: Size of the uploaded file, in bytes
+        :return: ScienceBase Catalog ItemFile JSON pointing at the upload
+        """
+        itemfile['size'] = size
+        itemfile['pathOnDisk'] = upload_json['fileKey']
+        itemfile['dateUploaded'] = upload_json['dateUploaded']
+        itemfile['uploadedBy'] = upload_json['uploadedBy']
+        itemfile['checksum']= {'value': checksum, 'type': 'MD5'}
         return itemfile
 
     def get_file_checksum(self, filename):
@@ -821,13 +1592,45 @@ class SbSession:
         
         :param filename: File to get checksum on
         """
-        with open(filename, 'rb') as f:
-            file_hash = hashlib.md5()
-            chunk = f.read(8192)
-            while chunk:
-                file_hash.update(chunk)
-                chunk = f.read(8192)
-            return file_hash.hexdigest()
+        if self._checksum_cache is not None:
+            return self._checksum_cache.checksum(filename)
+        return file_md5(filename)
+
+    def checksum_many(self, filenames, max_workers=None):
+        """Get the MD5 checksums of many files, hashing them concurrently with large reads.  The checksum
+        cache is used if it is enabled.
+
+        :param filenames: List of file paths
+        :param max_workers: Maximum number of files to hash at once
+        :return: Dictionary of the MD5 checksum of each file, by path
+        """
+        return checksum_many(filenames, max_workers, self.get_file_checksum)
+
+    def enable_checksum_cache(self, database, verify_rate=0):
+        """Keep the MD5 checksums of local files in a SQLite database, so that files which have not changed
+        since they were last hashed (by path, size, modification time and inode) are not hashed again when
+        they are uploaded or checked.  Any checksum cache already enabled is disabled first.
+
+        :param database: Path of the SQLite database file, or a ChecksumCache
+        :param verify_rate: Fraction of cached checksums, between 0 and 1, to verify by hashing the file again
+        in get_file_checksum()
+        :return: The SbSession object
+        """
+        self.disable_checksum_cache()
+        if isinstance(database, ChecksumCache):
+            self._checksum_cache = database
+        else:
+            self._checksum_cache = ChecksumCache(database, verify_rate)
+            self._owns_checksum_cache = True
+        return self
+
+    def disable_checksum_cache(self):
+        """Stop using the checksum cache, closing its database if it was opened by enable_checksum_cache().  A
+        ChecksumCache passed to enable_checksum_cache() is left open."""
+        if self._checksum_cache is not None and self._owns_checksum_cache:
+            self._checksum_cache.close()
+        self._checksum_cache = None
+        self._owns_checksum_cache = False
 
     def delete_file(self, sb_filename, item):
         """Delete a file on a ScienceBase Item.  This method will delete all files with the provided
@@ -1038,14 +1841,18 @@ class SbSession:
             items = self.next(items)
         return retval
 
-    def get_ancestor_ids(self, parentid):
+    def get_ancestor_ids(self, parentid, max_workers=None):
         """Get IDs of all descendants of given item excluding those which are linked in (short-cutted).
         Finds items by ancestorsExcludingLinks.
 
         :param parentid: ScienceBase Catalog Item ID of the item for which to look for descendants
+        :param max_workers: If given, fetch the result pages concurrently using up to this many requests at once
         :return: A List of ScienceBase Catalog Item IDs of the descendants
         """
         self._refresh_check()
+        if max_workers:
+            params = {'filter': 'ancestorsExcludingLinks=' + parentid, 'fields': 'id', 'max': self._max_item_count}
+            return [item['id'] for item in self.find_all_items(params, max_workers=max_workers)]
         retval = []
         items = self.find_items({'filter':'ancestorsExcludingLinks=' + parentid, 'max': self._max_item_count})
         while items and 'items' in items:
@@ -1069,6 +1876,65 @@ class SbSession:
             items = self.next(items)
         return retval
 
+    def iter_tree(self, root_id, max_workers=8, shortcuts=False):
+        """Walk the hierarchy under an item breadth-first, fetching the children of each level concurrently.
+        Nodes are yielded as they are discovered, so very large trees can be processed without holding
+        them in memory.  Shortcutted (linked) items are not followed.
+
+        :param root_id: ScienceBase Catalog Item ID of the root of the tree
+        :param max_workers: Maximum number of concurrent requests
+        :param shortcuts: Whether to include, for each node, the IDs of the items to which it is shortcutted
+        :return: Generator yielding a dictionary for each node, containing id, title, parentId, depth,
+        path (the list of IDs from the root down to the node) and hasChildren, plus shortcutIds if requested
+        """
+        self._refresh_check()
+        fields = 'id,title,parentId,hasChildren'
+
+        def _get_children(node):
+            if not node['hasChildren']:
+                return []
+            params = {'filter': 'parentIdExcludingLinks=' + node['id'], 'fields': fields, 'max': self._max_item_count}
+            return [self._tree_node(item, node['depth'] + 1, node['path']) for item in self._find_all_pages(params)]
+
+        def _add_shortcuts(node):
+            node['shortcutIds'] = self.get_shortcut_ids(node['id'])
+            return node
+
+        level = [self._tree_node(self.get_item(root_id, params={'fields': fields}), 0, [])]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while level:
+                if shortcuts:
+                    level = list(executor.map(_add_shortcuts, level))
+                next_level = []
+                for node, children in zip(level, executor.map(_get_children, level)):
+                    node['childIds'] = [child['id'] for child in children]
+                    next_level.extend(children)
+                    yield node
+                level = next_level
+
+    def walk_tree(self, root_id, max_workers=8, shortcuts=False):
+        """Build an index of the hierarchy under an item, fetching the children of each level concurrently.
+        Shortcutted (linked) items are not followed.
+
+        :param root_id: ScienceBase Catalog Item ID of the root of the tree
+        :param max_workers: Maximum number of concurrent requests
+        :param shortcuts: Whether to include, for each node, the IDs of the items to which it is shortcutted
+        :return: Dictionary keyed by item ID of the nodes of the tree, as yielded by iter_tree(). Each node's
+        childIds gives the IDs of its immediate children.
+        """
+        return {node['id']: node for node in self.iter_tree(root_id, max_workers, shortcuts)}
+
+    def _tree_node(self, item, depth, parent_path):
+        """Create a tree node from item JSON
+
+        :param item: ScienceBase Catalog Item JSON
+        :param depth: Depth of the item below the root of the tree
+        :param parent_path: List of the IDs from the root of the tree down to the item's parent
+        :return: Tree node dictionary
+        """
+        return {'id': item['id'], 'title': item.get('title'), 'parentId': item.get('parentId'), 'depth': depth,
+                'path': parent_path + [item['id']], 'hasChildren': item.get('hasChildren', True)}
+
     def create_shortcut(self, itemid, parentid):
         """Create a shortcut to another item
 
@@ -1078,6 +1944,7 @@ class SbSession:
         """
         self._refresh_check()
         ret = self._session.post(self._base_shortcut_item_url, params={'itemId':itemid, 'destId':parentid})
+        self._invalidate_cache(itemid, parentid)
         return self._get_json(ret)
 
     def remove_shortcut(self, itemid, parentid):
@@ -1089,6 +1956,7 @@ class SbSession:
         """
         self._refresh_check()
         ret = self._session.post(self._base_unlink_item_url, params={'itemId':itemid, 'destId':parentid})
+        self._invalidate_cache(itemid, parentid)
         return self._get_json(ret)
 
     def get_NetCDFOPeNDAP_info_facet(self, url):
@@ -1111,7 +1979,7 @@ class SbSession:
         facet['variables'] = data['variables']
         return facet
 
-    def add_extent(self, item_id, feature_geojson):
+    def add_extent(self, item_id, feature_geojson, tolerance=None, digits=None):
         """Create an extent from Feature or FeatureCollection geojson and add it to the item's footprint.
         There are several properties that ScienceBase stores in the master extents
         table: name, shortName, description, and promotedForReuse.  If desired,
@@ -1119,25 +1987,70 @@ class SbSession:
 
         :param item_id: ScienceBase Catalog Item ID of the item to which to add the extent
         :param feature_geojson: GeoJSON describing the extent to create
+        :param tolerance: If given, simplify the geometries before uploading, dropping points closer than this
+        distance (in coordinate units) to the simplified shape
+        :param digits: If given, round the coordinates to this many decimal places before uploading
         :return: ScienceBase Catalog Item JSON of the updated item.
         """
+        result = self.add_extents({item_id: feature_geojson}, tolerance, digits)
+        if item_id in result.failed:
+            raise Exception("Error adding extent to " + item_id + ": " + result.failed[item_id])
+        return result.succeeded[item_id]
+
+    def add_extents(self, features_by_item, tolerance=None, digits=None, max_workers=4):
+        """Create extents from Feature or FeatureCollection geojson and add them to the footprints of many
+        items.  All features are sent at once rather than one at a time, so the number of requests does not
+        depend on the number of features: one search for the items' existing extents, one update creating the
+        new extents, and one update adding the existing extents back (only for items which had any).  Items
+        missing from the search results, such as items created moments ago, are read individually.
+
+        :param features_by_item: Dictionary of Feature or FeatureCollection GeoJSON, keyed by item ID
+        :param tolerance: If given, simplify the geometries before uploading, dropping points closer than this
+        distance (in coordinate units) to the simplified shape
+        :param digits: If given, round the coordinates to this many decimal places before uploading
+        :param max_workers: Maximum number of concurrent requests
+        :return: BulkResult with the ScienceBase Catalog Item JSON of each updated item, keyed by item ID
+        """
         self._refresh_check()
-        features = feature_geojson['features'] if feature_geojson['type'] == "FeatureCollection" else [feature_geojson]
-        # Get the item from ScienceBase
-        item = self.get_item(item_id)
+        new_extents = {}
+        for item_id, feature_geojson in features_by_item.items():
+            features = feature_geojson['features'] if feature_geojson['type'] == "FeatureCollection" else [feature_geojson]
+            if tolerance is not None or digits is not None:
+                features = [reduce_feature(feature, tolerance, digits) for feature in features]
+            new_extents[item_id] = features
         # Save the existing item extents
-        extents = item['extents'] if 'extents' in item else []
-        for feature in features:
-            # Create the new extent, which will overwrite the exiting extent ID list
-            item['extents'] = [feature]
-            item = self.update_item(item)
-            extents.extend(item['extents'])
-        # If there were extents on the item, add them back
-        if len(extents) > 1:
-            item['extents'] = extents
-            item = self.update_item(item)
-        # Return the item JSON
-        return item
+        existing = self.get_items(list(new_extents), fields='extents', max_workers=max_workers)
+        # Items which are not (yet) in the search index are read directly
+        missing = [item_id for item_id, item in existing.items() if item is None]
+        errors = {}
+
+        def _get_item(item_id):
+            try:
+                existing[item_id] = self.get_item(item_id)
+            except Exception as exc:
+                errors[item_id] = exc
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                list(executor.map(_get_item, missing))
+        # Create the new extents, which will overwrite the existing extent ID lists
+        result = self.update_items_bulk([{'id': item_id, 'extents': features} for item_id, features in new_extents.items()
+                                         if item_id not in errors], max_workers=max_workers)
+        for item_id, error in errors.items():
+            result.add_failure(item_id, error)
+        # If there were extents on the items, add them back
+        restore = []
+        for item_id, item in result.succeeded.items():
+            old_extents = existing[item_id].get('extents', [])
+            if old_extents:
+                restore.append({'id': item_id, 'extents': old_extents + (item or {}).get('extents', [])})
+        if restore:
+            restored = self.update_items_bulk(restore, max_workers=max_workers)
+            for item_id, item in restored.succeeded.items():
+                result.add_success(item_id, item)
+            for item_id, error in restored.failed.items():
+                result.add_failure(item_id, error)
+        return result
 
     def find_items(self, params):
         """Search for ScienceBase items
@@ -1147,6 +2060,221 @@ class SbSession:
         """
         return self.get_json(self._base_items_url, params=params)
 
+    def iter_items(self, params, prefetch=2, fields=None, stream=False):
+        """Iterate over the individual items of a search across all result pages.  While the caller
+        consumes the items of one page, the following pages are fetched in a background thread.
+
+        :param params: ScienceBase Catalog search parameters
+        :param prefetch: Maximum number of pages to fetch ahead of the caller.  This bounds the number
+        of result pages held in memory at any time.
+        :param fields: Comma-separated string or list of item fields to retrieve.  If given, compact
+        read-only ItemRecord objects holding only these fields are returned instead of item JSON.
+        :param stream: Whether to parse each result page incrementally as it is received, yielding each
+        item as soon as it is decoded.  Only about one item is held in memory at a time, rather than a
+        page; pages are not prefetched.
+        :return: Generator yielding ScienceBase Catalog Item JSON (or ItemRecord) for each matching item
+        """
+        if fields:
+            params, record = self._fields_params(params, fields)
+        if stream:
+            items = self._iter_items_streaming(params)
+        else:
+            items = (item for page in self._iter_pages(self.find_items, params, prefetch) for item in page['items'])
+        for item in items:
+            yield record.from_json(item) if fields else item
+
+    def _iter_items_streaming(self, params):
+        """Iterate over the items of a search, parsing each result page incrementally
+
+        :param params: ScienceBase Catalog search parameters
+        :return: Generator yielding ScienceBase Catalog Item JSON for each matching item
+        """
+        self._refresh_check()
+        url = self._base_items_url
+        while url:
+            response = self._session.get(url, params=params, stream=True)
+            try:
+                if response.status_code != 200:
+                    # Error responses are small, so check them as usual
+                    self._check_errors(response)
+                page = {}
+                count = 0
+                for item in iter_json_array(response.iter_content(chunk_size=65536), 'items', page):
+                    count += 1
+                    yield item
+            finally:
+                response.close()
+            url = page['nextlink']['url'] if count and 'nextlink' in page else None
+            params = None
+
+    def find_result_set(self, params, page_size=None, max_cached_pages=10):
+        """Search for ScienceBase items, returning a result set which supports len(), indexing, slicing and
+        direct access to any page by offset, without walking the pages before it.
+
+        :param params: ScienceBase Catalog search parameters
+        :param page_size: Number of items per page. Defaults to the 'max' search parameter, or 1000.
+        :param max_cached_pages: Maximum number of fetched pages kept in memory for reuse
+        :return: ResultSet for the search
+        """
+        self._refresh_check()
+        return ResultSet(self, params, page_size, max_cached_pages)
+
+    def find_all_items(self, params, max_workers=4, shards=None, fields=None):
+        """Retrieve all items matching a search, fetching the result pages concurrently.  The total
+        number of results is read from the first page, and the remaining pages are requested directly
+        by offset rather than by walking the nextlinks one after another.
+
+        :param params: ScienceBase Catalog search parameters
+        :param max_workers: Maximum number of concurrent page requests
+        :param shards: Optional list of additional search filters, e.g. ['dateRange=...', ...], each
+        selecting a disjoint part of the results.  Each shard is searched separately and the results
+        are merged in shard order.
+        :param fields: Comma-separated string or list of item fields to retrieve.  If given, compact
+        read-only ItemRecord objects holding only these fields are returned instead of item JSON.
+        :return: List of ScienceBase Catalog Item JSON (or ItemRecord), in the same order as a serial walk of the results
+        """
+        self._refresh_check()
+        if fields:
+            params, record = self._fields_params(params, fields)
+        shard_params = [params] if not shards else [self._add_filter(params, shard) for shard in shards]
+        # ScienceBase returns at most _max_item_count items per page, whatever 'max' asks for
+        page_size = min(int(params.get('max', self._max_item_count)), self._max_item_count)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            first_pages = list(executor.map(
+                lambda p: self.find_items(dict(p, max=page_size, offset=0)), shard_params))
+            #
+            # Request every remaining page of every shard by offset
+            #
+            requests_by_shard = []
+            for shard, first_page in zip(shard_params, first_pages):
+                if first_page and 'total' not in first_page and 'nextlink' in first_page:
+                    # No total to shard on, fall back to walking the nextlinks
+                    requests_by_shard.append([executor.submit(self._walk_pages, first_page)])
+                    continue
+                total = first_page.get('total', 0) if first_page else 0
+                # Step by the size of the page actually returned, in case the server's limit is lower still
+                step = page_size
+                returned = len(first_page.get('items', [])) if first_page else 0
+                if 0 < returned < page_size and total > returned:
+                    step = returned
+                requests_by_shard.append([
+                    executor.submit(self.find_items, dict(shard, max=step, offset=offset))
+                    for offset in range(step, total, step)])
+            #
+            # Merge the pages in order, dropping any item returned by more than one shard
+            #
+            ret = []
+            seen = set()
+            for shard in range(len(first_pages)):
+                # Release each page once merged, so that only the merged items are kept in memory
+                pages = [first_pages[shard]] + requests_by_shard[shard]
+                first_pages[shard] = requests_by_shard[shard] = None
+                while pages:
+                    page = pages.pop(0)
+                    page = page if isinstance(page, dict) or page is None else page.result()
+                    for item in (page or {}).get('items', []):
+                        if item['id'] not in seen:
+                            seen.add(item['id'])
+                            ret.append(record.from_json(item) if fields else item)
+        return ret
+
+    def _fields_params(self, params, fields):
+        """Get the search parameters and record type for retrieving only the given item fields
+
+        :param params: ScienceBase Catalog search parameters
+        :param fields: Comma-separated string or list of item fields
+        :return: Tuple of the search parameters including the fields, and the ItemRecord type for them
+        """
+        record = record_type(fields)
+        return dict(params, fields=','.join(record._fields)), record
+
+    def _find_all_pages(self, params):
+        """Search for ScienceBase items, walking all of the result pages in the calling thread
+
+        :param params: ScienceBase Catalog search parameters
+        :return: List of ScienceBase Catalog Item JSON
+        """
+        page = self.find_items(params)
+        items = page['items'] if page and 'items' in page else []
+        return items + self._walk_pages(page)['items'] if page else items
+
+    def _walk_pages(self, page):
+        """Collect the pages following the given page by walking the nextlinks
+
+        :param page: ScienceBase Catalog search response object
+        :return: ScienceBase Catalog search response object holding the items of all following pages
+        """
+        items = []
+        page = self.next(page)
+        while page and 'items' in page and page['items']:
+            items.extend(page['items'])
+            page = self.next(page)
+        return {'items': items}
+
+    def _add_filter(self, params, search_filter):
+        """Return a copy of the search parameters with an additional filter
+
+        :param params: ScienceBase Catalog search parameters
+        :param search_filter: Filter to add, e.g. 'parentId=...'
+        :return: Copy of the search parameters including the filter
+        """
+        ret = dict(params)
+        filters = ret.get('filter', [])
+        filters = [filters] if isinstance(filters, str) else list(filters)
+        filters.append(search_filter)
+        ret['filter'] = filters
+        return ret
+
+    def _iter_pages(self, fetch, params, prefetch=2):
+        """Iterate over the pages of a search, following nextlinks in a background thread.
+
+        :param fetch: Function returning the first page of results for the given parameters
+        :param params: ScienceBase Catalog search parameters
+        :param prefetch: Maximum number of pages to fetch ahead of the caller
+        :return: Generator yielding ScienceBase Catalog search response objects containing items
+        """
+        if prefetch < 1:
+            raise ValueError("prefetch must be at least 1")
+        self._refresh_check()
+        pages = queue.Queue(maxsize=prefetch)
+        stop = threading.Event()
+        done = object()
+
+        def _put(entry):
+            # Block while the queue is full, giving up if the consumer has gone away
+            while not stop.is_set():
+                try:
+                    pages.put(entry, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def _fetch_pages():
+            try:
+                page = fetch(params)
+                while page and 'items' in page and page['items']:
+                    if not _put((page, None)):
+                        return
+                    page = self.next(page)
+                _put((done, None))
+            except Exception as exc:
+                _put((None, exc))
+
+        worker = threading.Thread(target=_fetch_pages, daemon=True)
+        worker.start()
+        try:
+            while True:
+                page, exc = pages.get()
+                if exc is not None:
+                    raise exc
+                if page is done:
+                    break
+                yield page
+        finally:
+            stop.set()
+            worker.join()
+
     def next(self, items):
         """Get the next set of items from the search
 
@@ -1211,13 +2339,68 @@ class SbSession:
         :param url: URL to request via HTTP GET
         :return: JSON response
         """
-        ret = None
-        if params:
-            ret = self._get_json(self._session.get(url, params=params))
-        else:
-            ret = self._get_json(self._session.get(url))
+        return self._get_json_cached(url, params if params else None)
+
+    def enable_cache(self, max_entries=1000, ttl=300, ttls=None):
+        """Cache the JSON responses of item reads and searches (get_item, find_items, get_json, etc.).
+        Expired responses are revalidated with ScienceBase using ETag/If-Modified-Since when available.
+        Item updates, moves and deletions made through this session remove the affected responses.
+
+        :param max_entries: Maximum number of responses to cache. The least recently used are evicted first.
+        :param ttl: Default time to live of a cached response, in seconds
+        :param ttls: Dictionary of time to live by ScienceBase Catalog endpoint, e.g. {'item': 600, 'items': 60}
+        :return: The SbSession object
+        """
+        self._cache = ResponseCache(max_entries, ttl, ttls)
+        return self
+
+    def disable_cache(self):
+        """Stop caching JSON responses, discarding any cached responses"""
+        self._cache = None
+
+    def _get_json_cached(self, url, params=None):
+        """Get the JSON response of the given URL, using the response cache if it is enabled
+
+        :param url: URL to request via HTTP GET
+        :param params: Query parameters
+        :return: JSON response
+        """
+        if self._cache is None:
+            return self._get_json(self._session.get(url, params=params))
+        key = self._cache.key(url, params)
+        entry = self._cache.get(key)
+        if entry is not None and entry.is_fresh():
+            return json.loads(entry.text)
+        headers = entry.conditional_headers() if entry is not None else {}
+        response = self._session.get(url, params=params, headers=headers)
+        if entry is not None and response.status_code == 304:
+            self._cache.refresh(entry)
+            return json.loads(entry.text)
+        ret = self._get_json(response)
+        if response.status_code == 200:
+            self._cache.put(key, response.text, response.headers.get('ETag'), response.headers.get('Last-Modified'))
         return ret
 
+    def _invalidate_cache(self, *item_ids):
+        """Remove cached responses concerning the given items after they have been modified
+
+        :param item_ids: ScienceBase Catalog Item IDs
+        """
+        if self._cache is not None:
+            self._cache.invalidate(item_ids)
+        if self._item_cache is not None:
+            self._item_cache.invalidate(item_ids)
+
+    def _cache_item(self, item):
+        """Store item JSON returned by ScienceBase after a change in the item cache, if it is enabled
+
+        :param item: ScienceBase Catalog Item JSON
+        :return: The item JSON
+        """
+        if self._item_cache is not None:
+            self._item_cache.put(item)
+        return item
+
     def get_directory_contact(self, party_id):
         """Get the Directory Contact JSON for the contact with the given party ID
 
@@ -1290,21 +2473,65 @@ class SbSession:
         """
         if response.status_code == 404:
             if "The specified URL cannot be found" in response.text:
-                raise Exception("Request blocked by the USGS web application firewall")
+                raise self._http_error("Request blocked by the USGS web application firewall", response)
             else:
-                raise Exception("Resource not found, or user does not have access")
+                raise self._http_error("Resource not found, or user does not have access", response)
         elif response.status_code == 401:
-            raise Exception("Unauthorized access")
+            raise self._http_error("Unauthorized access", response)
         elif response.status_code == 429:
-            raise Exception("Too many requests")
+            raise self._http_error("Too many requests", response)
         elif response.status_code != 200 and response.status_code != 201:
             if self._retry:
                 return response
             else:
-                raise Exception("Other HTTP error: " + str(response.status_code) + ": " + response.text)
+                raise self._http_error("Other HTTP error: " + str(response.status_code) + ": " + response.text, response)
         if "MyUSGS : Login" in response.text:
             raise Exception("Not logged in")
             
+    def _http_error(self, message, response):
+        """Create the exception for an HTTP error response
+
+        :param message: Error message
+        :param response: HTTP response
+        :return: Exception with the status_code of the response
+        """
+        exc = Exception(message)
+        exc.status_code = response.status_code
+        return exc
+
+    def _is_transient_error(self, exc):
+        """Whether an error is worth retrying: a connection error, timeout, rate limit or server error
+
+        :param exc: Exception raised by a request
+        :return: True if the request may succeed when retried
+        """
+        if isinstance(exc, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            return True
+        status_code = getattr(exc, 'status_code', None)
+        return status_code == 429 or (status_code is not None and status_code >= 500)
+
+    def _is_connect_error(self, exc):
+        """Whether a request failed while connecting, before anything was sent, so that retrying it cannot
+        repeat a change already made by ScienceBase
+
+        :param exc: Exception raised by a request
+        :return: True if the connection could not be established
+        """
+        if isinstance(exc, requests.exceptions.ConnectTimeout):
+            return True
+        if isinstance(exc, requests.exceptions.ConnectionError) and exc.args:
+            return isinstance(getattr(exc.args[0], 'reason', None), urllib3.exceptions.NewConnectionError)
+        return False
+
+    def _is_item_error(self, exc):
+        """Whether an error was caused by the content of the request, e.g. an invalid item in a bulk request,
+        rather than by the session or the server
+
+        :param exc: Exception raised by a request
+        :return: True if the error concerns particular items of the request
+        """
+        return getattr(exc, 'status_code', None) in (400, 422)
+
     def _remove_josso_param(self, url):
         """Remove JOSSO parameter from URL
 
@@ -1357,7 +2584,9 @@ class SbSession:
         :param acls: ACL JSON
         :return: The permissions JSON for the given item
         """
-        return self._get_json(self._session.put(self._base_item_url + item_id + "/permissions/", data=json.dumps(acls)))
+        ret = self._session.put(self._base_item_url + item_id + "/permissions/", data=json.dumps(acls))
+        self._invalidate_cache(item_id)
+        return self._get_json(ret)
 
     def add_acl_user_read(self, user_name, item_id):
         """Add a READ ACL for the given user on the specified item.
@@ -1876,18 +3105,20 @@ class SbSession:
         :param item_id: The ID of the ScienceBase item
         :return: The permissions JSON for the given item
         """
-        acls = self.get_permissions(item_id)
-        if read_write in acls:
-            if ('acl' not in acls[read_write]):
-                acls[read_write]['acl']=[]
-            if add_remove == self.ACL_ADD and acl_name not in acls[read_write]['acl']: 
-                acls[read_write]['acl'].append(acl_name)
-            elif add_remove == self.ACL_REMOVE and acl_name in acls[read_write]['acl']:
-                acls[read_write]['acl'].remove(acl_name)
-            acls[read_write]['inherited'] = False
-            acls.pop('inheritsFromId', None)
-            acls = self.set_permissions(item_id, acls)
-        return acls
+        def _update():
+            acls = self.get_permissions(item_id)
+            if read_write in acls:
+                if ('acl' not in acls[read_write]):
+                    acls[read_write]['acl']=[]
+                if add_remove == self.ACL_ADD and acl_name not in acls[read_write]['acl']: 
+                    acls[read_write]['acl'].append(acl_name)
+                elif add_remove == self.ACL_REMOVE and acl_name in acls[read_write]['acl']:
+                    acls[read_write]['acl'].remove(acl_name)
+                acls[read_write]['inherited'] = False
+                acls.pop('inheritsFromId', None)
+                acls = self.set_permissions(item_id, acls)
+            return acls
+        return self._journaled('_update_acls', [add_remove, read_write, acl_name, item_id], _update)
 
     def set_acls_inherit(self, read_write, item_id):
         """Set the item to inherit ACLs from its parent item.
@@ -1992,8 +3223,11 @@ class SbSession:
         if reverse:
             item_link_json['reverseRelationship'] = True
 
-        ret = self._session.post(f'{self._base_item_link_url}', data=json.dumps(item_link_json))
-        return self._get_json(ret)
+        def _create_link():
+            ret = self._session.post(f'{self._base_item_link_url}', data=json.dumps(item_link_json))
+            self._invalidate_cache(from_item_id, to_item_id)
+            return self._get_json(ret)
+        return self._journaled('create_item_link', [from_item_id, to_item_id, link_type_id, reverse], _create_link)
 
     def create_related_item_link(self, from_item_id, to_item_id):
         """Create a 'related' ItemLink (relationship) between the two items.
@@ -0,0 +1,42 @@
+"""TrackedItem remembers the fetched version of a ScienceBase Catalog Item to find what has changed."""
+import json
+
+
+class TrackedItem(dict):
+    """TrackedItem is ScienceBase Catalog Item JSON which remembers the version it was fetched as, so that
+    only the top-level fields which have since been changed need to be sent to ScienceBase.
+    """
+
+    def __init__(self, item_json):
+        """Track item JSON
+
+        :param item_json: ScienceBase Catalog Item JSON as fetched from ScienceBase
+        """
+        super().__init__(item_json)
+        self.mark_clean()
+
+    def changes(self):
+        """Get the top-level fields which differ from the tracked version
+
+        :return: Dictionary of the changed and added fields. Removed fields are given as None.
+        """
+        ret = {}
+        for field, value in self.items():
+            if self._original.get(field) != self._serialize(value):
+                ret[field] = value
+        for field in self._original:
+            if field not in self:
+                ret[field] = None
+        return ret
+
+    def is_changed(self):
+        """Whether any top-level field differs from the tracked version"""
+        return bool(self.changes())
+
+    def mark_clean(self):
+        """Make the current contents the tracked version"""
+        self._original = {field: self._serialize(value) for field, value in self.items()}
+
+    def _serialize(self, value):
+        """Serialize a field value, so that later changes to nested values are detected"""
+        return json.dumps(value, sort_keys=True)
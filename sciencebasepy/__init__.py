@@ -1,4 +1,11 @@
 from .SbSession import SbSession
+from .CatalogMirror import CatalogMirror
+from .ItemRecord import ItemRecord, record_type
+from .ResultSet import ResultSet
+from .bulk import BulkResult
+from .TrackedItem import TrackedItem
+from .OperationJournal import OperationJournal
+from .ChecksumCache import ChecksumCache
 
 __author__ = 'sciencebase'
 
@@ -0,0 +1,125 @@
+"""Helpers for bulk operations on ScienceBase Catalog Items."""
+from collections import OrderedDict
+import json
+import os
+import threading
+import time
+
+
+class BulkResult:
+    """BulkResult records the outcome of a bulk operation for each of its inputs, keyed by item ID
+    (or another key identifying the input).
+    """
+
+    def __init__(self):
+        self.succeeded = OrderedDict()
+        """ Dictionary of the result of each successful input, by key """
+        self.failed = OrderedDict()
+        """ Dictionary of the error message of each failed input, by key """
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'BulkResult(succeeded=%d, failed=%d)' % (len(self.succeeded), len(self.failed))
+
+    @property
+    def ok(self):
+        """Whether every input succeeded"""
+        return not self.failed
+
+    def add_success(self, key, result=None):
+        """Record a successful input
+
+        :param key: Key of the input
+        :param result: Result of the input, e.g. the updated item JSON
+        """
+        with self._lock:
+            self.failed.pop(key, None)
+            self.succeeded[key] = result
+
+    def add_failure(self, key, error):
+        """Record a failed input
+
+        :param key: Key of the input
+        :param error: Exception or error message
+        """
+        with self._lock:
+            self.succeeded.pop(key, None)
+            self.failed[key] = str(error)
+
+
+class RateLimiter:
+    """RateLimiter spaces out calls so that no more than a given number start per second, across threads"""
+
+    def __init__(self, rate=None):
+        """Create a rate limiter
+
+        :param rate: Maximum number of calls per second, or None for no limit
+        """
+        self._interval = 1.0 / rate if rate else 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Block until the next call may start"""
+        if not self._interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(self._next, now)
+            self._next = start + self._interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def chunk_items(items, max_count, max_bytes=None):
+    """Split item JSON into chunks limited by item count and serialized size
+
+    :param items: Iterable of ScienceBase Catalog Item JSON
+    :param max_count: Maximum number of items per chunk
+    :param max_bytes: Maximum serialized size of a chunk, in bytes. An item larger than this is sent alone.
+    :return: Generator yielding lists of (item, serialized item JSON) tuples
+    """
+    chunk = []
+    size = 2
+    for item in items:
+        serialized = json.dumps(item)
+        item_size = len(serialized.encode('utf-8')) + 1
+        if chunk and (len(chunk) >= max_count or (max_bytes and size + item_size > max_bytes)):
+            yield chunk
+            chunk = []
+            size = 2
+        chunk.append((item, serialized))
+        size += item_size
+    if chunk:
+        yield chunk
+
+
+def chunk_files(filenames, max_count, max_bytes=None):
+    """Split files into batches limited by file count and total size
+
+    :param filenames: Iterable of file paths
+    :param max_count: Maximum number of files per batch
+    :param max_bytes: Maximum total size of the files in a batch, in bytes. A file larger than this is sent alone.
+    :return: Generator yielding lists of file paths
+    """
+    batch = []
+    size = 0
+    for filename in filenames:
+        file_size = os.path.getsize(filename)
+        if batch and (len(batch) >= max_count or (max_bytes and size + file_size > max_bytes)):
+            yield batch
+            batch = []
+            size = 0
+        batch.append(filename)
+        size += file_size
+    if batch:
+        yield batch
+
+
+def chunk_payload(chunk):
+    """Get the JSON list payload of a chunk from chunk_items()
+
+    :param chunk: List of (item, serialized item JSON) tuples
+    :return: Serialized JSON list of the chunk's items
+    """
+    return '[' + ','.join(serialized for _, serialized in chunk) + ']'
@@ -0,0 +1,38 @@
+"""MD5 checksums of local files, computed with large reads."""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_md5(filename, chunk_size=CHUNK_SIZE):
+    """Get the MD5 checksum of a file, reading it in large blocks into a reused buffer
+
+    :param filename: Path of the file
+    :param chunk_size: Number of bytes to read at a time
+    :return: Hex digest of the file's MD5 checksum
+    """
+    file_hash = hashlib.md5()
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(filename, 'rb', buffering=0) as f:
+        n = f.readinto(buffer)
+        while n:
+            file_hash.update(view[:n])
+            n = f.readinto(buffer)
+    return file_hash.hexdigest()
+
+
+def checksum_many(paths, max_workers=None, checksum=file_md5):
+    """Get the MD5 checksums of many files, hashing them concurrently.  hashlib and file reads release
+    the GIL, so the files are hashed in parallel on a thread pool.
+
+    :param paths: Iterable of file paths
+    :param max_workers: Maximum number of files to hash at once. Defaults to the ThreadPoolExecutor default.
+    :param checksum: Function computing the checksum of one file
+    :return: OrderedDict of the hex digest of each file's MD5 checksum, by path, in the order given
+    """
+    paths = list(OrderedDict.fromkeys(paths))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return OrderedDict(zip(paths, executor.map(checksum, paths)))
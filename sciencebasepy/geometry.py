@@ -0,0 +1,100 @@
+"""Client-side GeoJSON geometry reduction, used to shrink extents before they are uploaded."""
+import copy
+
+
+def reduce_feature(feature, tolerance=None, digits=None):
+    """Reduce the size of a GeoJSON Feature's geometry
+
+    :param feature: GeoJSON Feature
+    :param tolerance: If given, simplify lines and rings with the Douglas-Peucker algorithm, dropping points
+    closer than this distance (in coordinate units) to the simplified shape
+    :param digits: If given, round coordinates to this many decimal places, dropping repeated points
+    :return: Copy of the feature with the reduced geometry
+    """
+    feature = copy.deepcopy(feature)
+    if feature.get('geometry'):
+        feature['geometry'] = reduce_geometry(feature['geometry'], tolerance, digits)
+    return feature
+
+
+def reduce_geometry(geometry, tolerance=None, digits=None):
+    """Reduce the size of a GeoJSON geometry.  Points are never removed below the minimum a line or
+    ring requires.
+
+    :param geometry: GeoJSON geometry
+    :param tolerance: If given, the Douglas-Peucker simplification tolerance, in coordinate units
+    :param digits: If given, the number of decimal places to round coordinates to
+    :return: Reduced GeoJSON geometry
+    """
+    geometry_type = geometry['type']
+    if geometry_type == 'GeometryCollection':
+        return dict(geometry, geometries=[reduce_geometry(g, tolerance, digits) for g in geometry['geometries']])
+    coordinates = geometry['coordinates']
+    if geometry_type == 'Point':
+        coordinates = _round_point(coordinates, digits)
+    elif geometry_type == 'MultiPoint':
+        coordinates = [_round_point(p, digits) for p in coordinates]
+    elif geometry_type == 'LineString':
+        coordinates = _reduce_line(coordinates, tolerance, digits, 2)
+    elif geometry_type == 'MultiLineString':
+        coordinates = [_reduce_line(line, tolerance, digits, 2) for line in coordinates]
+    elif geometry_type == 'Polygon':
+        coordinates = [_reduce_line(ring, tolerance, digits, 4) for ring in coordinates]
+    elif geometry_type == 'MultiPolygon':
+        coordinates = [[_reduce_line(ring, tolerance, digits, 4) for ring in polygon] for polygon in coordinates]
+    return dict(geometry, coordinates=coordinates)
+
+
+def _round_point(point, digits):
+    """Round the coordinates of a point, if digits is given"""
+    return [round(c, digits) for c in point] if digits is not None else list(point)
+
+
+def _reduce_line(points, tolerance, digits, min_points):
+    """Simplify and round a line or ring, keeping at least min_points points"""
+    if len(points) <= min_points:
+        return [_round_point(p, digits) for p in points]
+    reduced = _simplify(points, tolerance) if tolerance else list(points)
+    reduced = [_round_point(p, digits) for p in reduced]
+    deduplicated = [reduced[0]]
+    for point in reduced[1:]:
+        if point != deduplicated[-1]:
+            deduplicated.append(point)
+    if min_points == 4 and deduplicated[-1] != deduplicated[0]:
+        # Keep rings closed
+        deduplicated.append(deduplicated[0])
+    if len(deduplicated) < min_points:
+        return [_round_point(p, digits) for p in points]
+    return deduplicated
+
+
+def _simplify(points, tolerance):
+    """Douglas-Peucker line simplification"""
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        max_distance = 0
+        index = None
+        for i in range(first + 1, last):
+            distance = _segment_distance(points[i], points[first], points[last])
+            if distance > max_distance:
+                max_distance = distance
+                index = i
+        if index is not None and max_distance > tolerance:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return [p for p, k in zip(points, keep) if k]
+
+
+def _segment_distance(point, start, end):
+    """Distance from a point to the segment between start and end"""
+    x, y = point[0], point[1]
+    x1, y1 = start[0], start[1]
+    dx, dy = end[0] - x1, end[1] - y1
+    if dx == 0 and dy == 0:
+        return ((x - x1) ** 2 + (y - y1) ** 2) ** 0.5
+    t = max(0, min(1, ((x - x1) * dx + (y - y1) * dy) / (dx * dx + dy * dy)))
+    return ((x - x1 - t * dx) ** 2 + (y - y1 - t * dy) ** 2) ** 0.5
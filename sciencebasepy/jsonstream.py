@@ -0,0 +1,88 @@
+"""Incremental parsing of large ScienceBase JSON responses."""
+import codecs
+import json
+import re
+
+_SPECIAL_CHARS = re.compile(r'[\[\]{}",\\]')
+_EMPTY = object()
+
+
+def iter_json_array(chunks, key='items', envelope=None):
+    """Parse a JSON object incrementally, yielding each element of one of its top-level arrays as soon
+    as the element has been received.  Only the element being decoded is held in memory, rather than
+    the whole response.
+
+    :param chunks: Iterable of the bytes of the JSON object, e.g. response.iter_content()
+    :param key: Name of the top-level array whose elements to yield
+    :param envelope: Optional dictionary which, once all elements have been yielded, is updated with the
+    other top-level members of the object (the array itself is given as empty)
+    :return: Generator yielding the decoded array elements
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    key_pattern = re.compile(r'"%s"\s*:\s*$' % re.escape(key))
+    envelope_parts = []
+    element_parts = []
+    depth = 0
+    array_depth = None
+    in_string = False
+    escape = False
+
+    def _element():
+        text = ''.join(element_parts).strip()
+        del element_parts[:]
+        return json.loads(text) if text else _EMPTY
+
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        start = 0
+        pos = 0
+        if escape and text:
+            # The previous chunk ended with the backslash of an escape sequence
+            pos = 1
+            escape = False
+        while True:
+            match = _SPECIAL_CHARS.search(text, pos)
+            if match is None:
+                break
+            char = match.group()
+            p = match.start()
+            pos = p + 1
+            if in_string:
+                if char == '"':
+                    in_string = False
+                elif char == '\\':
+                    if p + 1 < len(text):
+                        pos = p + 2
+                    else:
+                        escape = True
+            elif char == '"':
+                in_string = True
+            elif char in '{[':
+                depth += 1
+                if char == '[' and depth == 2 and array_depth is None and \
+                        key_pattern.search(''.join(envelope_parts) + text[start:p]):
+                    envelope_parts.append(text[start:pos])
+                    array_depth = depth
+                    start = pos
+            elif char in '}]':
+                if depth == array_depth:
+                    element_parts.append(text[start:p])
+                    element = _element()
+                    if element is not _EMPTY:
+                        yield element
+                    array_depth = None
+                    start = p
+                depth -= 1
+            elif char == ',' and depth == array_depth:
+                element_parts.append(text[start:p])
+                element = _element()
+                if element is not _EMPTY:
+                    yield element
+                start = pos
+        (element_parts if array_depth is not None else envelope_parts).append(text[start:])
+
+    envelope_parts.append(decoder.decode(b'', final=True))
+    if envelope is not None:
+        text = ''.join(envelope_parts).strip()
+        if text:
+            envelope.update(json.loads(text))
@@ -0,0 +1,153 @@
+"""Streaming multipart/form-data request bodies for file uploads."""
+import binascii
+import io
+import os
+
+from .checksum import CHUNK_SIZE
+
+
+class MultipartEncoder:
+    """MultipartEncoder is a file-like multipart/form-data request body.  File parts are opened only
+    when the body reaches them and are read in large blocks as the request is sent, so that memory use
+    does not depend on the size of the files.  Its length is known up front, so requests sends it with
+    a Content-Length rather than chunked.
+
+    Pass it as the data of a request, with content_type as the Content-Type header.
+    """
+
+    def __init__(self, fields=None, files=None, progress_callback=None, chunk_size=CHUNK_SIZE):
+        """Create a multipart body
+
+        :param fields: List of (name, value) tuples of the form fields, sent before the files
+        :param files: List of (name, filename, source, content_type) tuples of the file parts. The source is the
+        path of a file, bytes, or a file-like object opened in binary mode. The filename defaults to the name of the
+        source file, and content_type may be None.
+        :param progress_callback: Optional function called as the body is read, as
+        progress_callback(bytes_sent, total_bytes)
+        :param chunk_size: Number of bytes to read from a file at a time
+        """
+        self.boundary = binascii.hexlify(os.urandom(16)).decode('ascii')
+        self._progress_callback = progress_callback
+        self._chunk_size = chunk_size
+        self._parts = []
+        for name, value in fields or []:
+            if not isinstance(value, bytes):
+                value = str(value).encode('utf-8')
+            self._parts.append(self._part_header(name) + value + b'\r\n')
+        for name, filename, source, content_type in files or []:
+            if filename is None:
+                filename = _source_filename(source, name)
+            if hasattr(source, 'read') and not (hasattr(source, 'seekable') and source.seekable()):
+                # The length of a stream must be known up front
+                source = source.read()
+            self._parts.append(self._part_header(name, filename, content_type))
+            self._parts.append(source)
+            self._parts.append(b'\r\n')
+        self._parts.append(('--%s--\r\n' % self.boundary).encode('ascii'))
+        self.len = sum(self._part_length(part) for part in self._parts)
+        self._sent = 0
+        self._index = 0
+        self._file = None
+        self._buffer = b''
+        self._offset = 0
+
+    @property
+    def content_type(self):
+        """Content-Type header of the body, including the boundary"""
+        return 'multipart/form-data; boundary=%s' % self.boundary
+
+    @property
+    def bytes_sent(self):
+        """Number of bytes of the body read so far"""
+        return self._sent
+
+    def __len__(self):
+        return self.len
+
+    def _part_header(self, name, filename=None, content_type=None):
+        """Get the boundary and headers of a part"""
+        disposition = 'form-data; name="%s"' % _quote(name)
+        if filename is not None:
+            disposition += '; filename="%s"' % _quote(filename)
+        header = '--%s\r\nContent-Disposition: %s\r\n' % (self.boundary, disposition)
+        if content_type:
+            header += 'Content-Type: %s\r\n' % content_type
+        return (header + '\r\n').encode('utf-8')
+
+    def _part_length(self, part):
+        """Get the number of bytes of a part still to be sent"""
+        if isinstance(part, (bytes, bytearray)):
+            return len(part)
+        if isinstance(part, str):
+            return os.path.getsize(part)
+        position = part.tell()
+        length = part.seek(0, io.SEEK_END) - position
+        part.seek(position)
+        return length
+
+    def _next_block(self):
+        """Get the next block of the body, opening and closing files as the body reaches them
+
+        :return: Next block of bytes, or empty bytes at the end of the body
+        """
+        while self._index < len(self._parts):
+            part = self._parts[self._index]
+            if isinstance(part, (bytes, bytearray)):
+                self._index += 1
+                if part:
+                    return bytes(part)
+                continue
+            if self._file is None:
+                self._file = open(part, 'rb') if isinstance(part, str) else part
+            block = self._file.read(self._chunk_size)
+            if block:
+                return block
+            if isinstance(part, str):
+                self._file.close()
+            self._file = None
+            self._index += 1
+        return b''
+
+    def read(self, size=-1):
+        """Read the next bytes of the body
+
+        :param size: Maximum number of bytes to read, or -1 to read the rest of the body
+        :return: The bytes read, or empty bytes at the end of the body
+        """
+        blocks = []
+        length = 0
+        while size < 0 or length < size:
+            if self._offset >= len(self._buffer):
+                self._buffer = self._next_block()
+                self._offset = 0
+                if not self._buffer:
+                    break
+            end = len(self._buffer) if size < 0 else self._offset + size - length
+            block = self._buffer[self._offset:end]
+            self._offset += len(block)
+            blocks.append(block)
+            length += len(block)
+        data = blocks[0] if len(blocks) == 1 else b''.join(blocks)
+        self._sent += len(data)
+        if self._progress_callback and data:
+            self._progress_callback(self._sent, self.len)
+        return data
+
+    def close(self):
+        """Close any file opened by the body"""
+        if self._file is not None and isinstance(self._parts[self._index], str):
+            self._file.close()
+        self._file = None
+
+
+def _quote(value):
+    """Escape a multipart header parameter value"""
+    return value.replace('\\', '\\\\').replace('"', '%22').replace('\r', '%0D').replace('\n', '%0A')
+
+
+def _source_filename(source, default):
+    """Get the filename of a file part from its source, as requests does"""
+    name = source if isinstance(source, str) else getattr(source, 'name', None)
+    if isinstance(name, str) and name and name[0] != '<' and name[-1] != '>':
+        return os.path.basename(name)
+    return default
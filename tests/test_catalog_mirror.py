@@ -0,0 +1,33 @@
+import sciencebasepy as pysb
+
+
+ITEM_URL = "https://beta.sciencebase.gov/catalog/item/"
+ITEMS_URL = "https://beta.sciencebase.gov/catalog/items/"
+
+
+class TestCatalogMirror():
+
+    def test_sync(self, requests_mock, tmp_path):
+        requests_mock.get(ITEM_URL + 'root', json={'id': 'root', 'title': 'Root', 'lastUpdated': '2024-01-01T00:00:00Z'})
+        requests_mock.get(ITEMS_URL, json={'items': [
+            {'id': 'a', 'parentId': 'root', 'title': 'A', 'lastUpdated': '2024-02-01T00:00:00Z',
+             'files': [{'name': 'data.csv', 'size': 10, 'checksum': {'type': 'MD5', 'value': 'abc'}}],
+             'extents': [1234]},
+            {'id': 'b', 'parentId': 'a', 'title': 'B', 'lastUpdated': '2024-03-01T00:00:00Z',
+             'facets': [{'name': 'shapefile', 'files': [{'name': 'shape.shp'}]}]},
+        ]})
+        sb_session = pysb.SbSession(env="beta")
+
+        with pysb.CatalogMirror(sb_session, str(tmp_path / 'mirror.db')) as mirror:
+            assert mirror.sync('root') == 2
+            assert mirror.get_last_updated('root') == '2024-03-01T00:00:00Z'
+            assert mirror.get_item('b')['title'] == 'B'
+            assert mirror.get_child_ids('root') == ['a']
+            assert mirror.find_files(checksum='abc')[0]['itemId'] == 'a'
+            assert mirror.find_files(item_id='b')[0]['facet'] == 'shapefile'
+            assert mirror.find_items_by_extent(1234) == ['a']
+
+            # Incremental sync only asks for items updated since the last sync
+            mirror.sync('root')
+            search = requests_mock.request_history[-1]
+            assert any('2024-03-01' in f for f in search.qs['filter'])
@@ -0,0 +1,748 @@
+import hashlib
+import json
+import pytest
+import requests
+import requests_mock
+import sys
+import time
+import sciencebasepy as pysb
+from sb3 import SbSessionEx
+
+
+BASE_ITEMS_URL = "https://beta.sciencebase.gov/catalog/items/"
+
+
+def _page(ids, next_offset=None, total=None):
+    """Build a ScienceBase Catalog search response page for the given item IDs"""
+    page = {'items': [{'id': item_id, 'title': 'Item ' + item_id} for item_id in ids]}
+    if total is not None:
+        page['total'] = total
+    if next_offset is not None:
+        page['nextlink'] = {'rel': 'next', 'url': BASE_ITEMS_URL + '?offset=%d' % next_offset}
+    return page
+
+
+class TestSearch():
+
+    def test_iter_items(self, requests_mock):
+        requests_mock.get(BASE_ITEMS_URL, [
+            {'json': _page(['a', 'b'], next_offset=2), 'status_code': 200},
+            {'json': _page(['c', 'd'], next_offset=4), 'status_code': 200},
+            {'json': _page(['e']), 'status_code': 200},
+        ])
+        sb_session = pysb.SbSession(env="beta")
+
+        ids = [item['id'] for item in sb_session.iter_items({'q': 'test'}, prefetch=1)]
+        assert ids == ['a', 'b', 'c', 'd', 'e']
+        assert requests_mock.call_count == 3
+
+    def test_iter_items_early_exit(self, requests_mock):
+        requests_mock.get(BASE_ITEMS_URL, json=_page(['a', 'b'], next_offset=2), status_code=200)
+        sb_session = pysb.SbSession(env="beta")
+
+        items = sb_session.iter_items({'q': 'test'}, prefetch=1)
+        assert next(items)['id'] == 'a'
+        items.close()
+
+    def test_find_all_items(self, requests_mock):
+        all_ids = ['id%02d' % i for i in range(7)]
+
+        def _search(request, context):
+            offset = int(request.qs['offset'][0])
+            page_size = int(request.qs['max'][0])
+            return _page(all_ids[offset:offset + page_size], total=len(all_ids))
+
+        requests_mock.get(BASE_ITEMS_URL, json=_search)
+        sb_session = pysb.SbSession(env="beta")
+
+        items = sb_session.find_all_items({'q': 'test', 'max': 3}, max_workers=3)
+        assert [item['id'] for item in items] == all_ids
+        assert requests_mock.call_count == 3
+
+    def test_find_all_items_page_limit(self, requests_mock):
+        all_ids = ['id%02d' % i for i in range(25)]
+        server_limit = [4]
+
+        def _search(request, context):
+            offset = int(request.qs['offset'][0])
+            page_size = min(int(request.qs['max'][0]), server_limit[0])
+            return _page(all_ids[offset:offset + page_size], total=len(all_ids))
+
+        requests_mock.get(BASE_ITEMS_URL, json=_search)
+        sb_session = pysb.SbSession(env="beta")
+        sb_session._max_item_count = 4
+
+        items = sb_session.find_all_items({'q': 'test', 'max': 10})
+        assert [item['id'] for item in items] == all_ids
+
+        # A server limit below the maximum item count is stepped over too
+        server_limit[0] = 3
+        items = sb_session.find_all_items({'q': 'test', 'max': 10})
+        assert [item['id'] for item in items] == all_ids
+
+    def test_find_items_by_filter_and_hidden_property(self, requests_mock):
+        requests_mock.get("https://beta.sciencebase.gov/catalog/itemHiddenProperties", json={
+            'itemHiddenProperties': [
+                {'itemId': 'a', 'type': 'Note', 'value': 'x'},
+                {'itemId': 'c', 'type': 'Note', 'value': 'y'},
+            ]})
+        requests_mock.get(BASE_ITEMS_URL, json=_page(['a', 'c']))
+        sb_session = pysb.SbSession(env="beta")
+
+        items = sb_session.find_items_by_filter_and_hidden_property({'q': 'test'}, {'type': 'Note'})
+        assert [item['id'] for item in items] == ['a', 'c']
+        assert items[1]['hiddenProperties'] == {'Note': 'y'}
+        search = requests_mock.request_history[-1]
+        assert search.qs['lq'] == ['id:("a" or "c")']
+
+
+BASE_ITEM_URL = "https://beta.sciencebase.gov/catalog/item/"
+
+
+class TestResponseCache():
+
+    def test_cache_and_invalidate(self, requests_mock):
+        requests_mock.get(BASE_ITEM_URL + 'a', json={'id': 'a', 'title': 'A'})
+        requests_mock.put(BASE_ITEM_URL + 'a', json={'id': 'a', 'title': 'B'})
+        sb_session = pysb.SbSession(env="beta").enable_cache(ttl=60)
+
+        assert sb_session.get_item('a')['title'] == 'A'
+        assert sb_session.get_item('a')['title'] == 'A'
+        assert requests_mock.call_count == 1
+
+        sb_session.update_item({'id': 'a', 'title': 'B'})
+        sb_session.get_item('a')
+        assert requests_mock.call_count == 3
+
+    def test_cache_revalidation(self, requests_mock):
+        requests_mock.get(BASE_ITEM_URL + 'a', [
+            {'json': {'id': 'a', 'title': 'A'}, 'headers': {'ETag': '"v1"'}, 'status_code': 200},
+            {'status_code': 304},
+        ])
+        sb_session = pysb.SbSession(env="beta").enable_cache(ttl=0)
+
+        sb_session.get_item('a')
+        assert sb_session.get_item('a')['title'] == 'A'
+        assert requests_mock.request_history[-1].headers['If-None-Match'] == '"v1"'
+
+    def test_item_cache(self, requests_mock):
+        requests_mock.get(BASE_ITEM_URL + 'a', [
+            {'json': {'id': 'a', 'title': 'A', 'lastUpdated': 'v1'}, 'status_code': 200},
+            {'json': {'lastUpdated': 'v1'}, 'status_code': 200},
+            {'json': {'id': 'a', 'title': 'A', 'lastUpdated': 'v1'}, 'status_code': 200},
+        ])
+        requests_mock.put(BASE_ITEM_URL + 'a', json={'id': 'a', 'title': 'B', 'lastUpdated': 'v2'})
+        sb_session = pysb.SbSession(env="beta").enable_item_cache(max_age=60)
+
+        assert sb_session.get_item('a')['title'] == 'A'
+        assert sb_session.get_item('a')['title'] == 'A'
+        assert requests_mock.call_count == 1
+
+        # A stale entry is only checked by version
+        assert sb_session.get_item('a', max_age=-1)['title'] == 'A'
+        assert requests_mock.request_history[-1].qs['fields'] == ['lastupdated']
+        assert sb_session.get_item('a', max_age=0)['title'] == 'A'
+        assert requests_mock.call_count == 3
+
+        # Updates write through
+        sb_session.update_item({'id': 'a', 'title': 'B'})
+        assert sb_session.get_item('a')['title'] == 'B'
+        assert requests_mock.call_count == 4
+
+    def test_item_cache_bypasses_response_cache(self, requests_mock):
+        requests_mock.get(BASE_ITEM_URL + 'a', [
+            {'json': {'id': 'a', 'title': 'A', 'lastUpdated': 'v1'}, 'status_code': 200},
+            {'json': {'id': 'a', 'title': 'B', 'lastUpdated': 'v2'}, 'status_code': 200},
+            {'json': {'lastUpdated': 'v3'}, 'status_code': 200},
+            {'json': {'id': 'a', 'title': 'C', 'lastUpdated': 'v3'}, 'status_code': 200},
+        ])
+        sb_session = pysb.SbSession(env="beta").enable_cache(ttl=600).enable_item_cache(max_age=60)
+
+        assert sb_session.get_item('a')['title'] == 'A'
+        assert sb_session.get_item('a', max_age=0)['title'] == 'B'
+        assert sb_session.get_item('a', max_age=-1)['title'] == 'C'
+        assert requests_mock.call_count == 4
+
+
+class TestBulkRead():
+
+    def test_get_items(self, requests_mock):
+        requests_mock.get(BASE_ITEMS_URL, [
+            {'json': _page(['a', 'b']), 'status_code': 200},
+            {'json': _page(['c']), 'status_code': 200},
+        ])
+        sb_session = pysb.SbSession(env="beta")
+        sb_session._max_ids_per_query = 2
+
+        items = sb_session.get_items(['a', 'b', 'c', 'd'], fields='title', max_workers=1)
+        assert list(items) == ['a', 'b', 'c', 'd']
+        assert items['c']['title'] == 'Item c'
+        assert items['d'] is None
+        assert requests_mock.call_count == 2
+        assert requests_mock.request_history[0].qs['fields'] == ['title']
+
+    def test_iter_items_fields(self, requests_mock):
+        requests_mock.get(BASE_ITEMS_URL, json={'items': [
+            {'id': 'a', 'title': 'A', 'files': [{'name': 'data.csv'}]},
+        ]})
+        sb_session = pysb.SbSession(env="beta")
+
+        records = list(sb_session.iter_items({'q': 'test'}, fields='title,files'))
+        assert requests_mock.request_history[0].qs['fields'] == ['id,title,files']
+        assert records[0].id == 'a'
+        assert records[0]['title'] == 'A'
+        assert records[0].files == [{'name': 'data.csv'}]
+        assert not hasattr(records[0], '__dict__')
+        assert records[0].to_json() == {'id': 'a', 'title': 'A', 'files': [{'name': 'data.csv'}]}
+
+    def test_iter_items_stream(self, requests_mock):
+        requests_mock.get(BASE_ITEMS_URL, [
+            {'text': json.dumps(_page(['a', 'b'], next_offset=2)), 'status_code': 200},
+            {'text': json.dumps(_page(['c'])), 'status_code': 200},
+        ])
+        sb_session = pysb.SbSession(env="beta")
+
+        ids = [item['id'] for item in sb_session.iter_items({'q': 'test'}, stream=True)]
+        assert ids == ['a', 'b', 'c']
+
+
+class TestHierarchy():
+
+    def test_walk_tree(self, requests_mock):
+        children = {
+            'root': [{'id': 'a', 'parentId': 'root', 'hasChildren': True},
+                     {'id': 'b', 'parentId': 'root', 'hasChildren': False}],
+            'a': [{'id': 'c', 'parentId': 'a', 'hasChildren': False}],
+        }
+
+        def _search(request, context):
+            return {'items': children[request.qs['filter'][0].split('=')[1]]}
+
+        requests_mock.get(BASE_ITEM_URL + 'root', json={'id': 'root', 'title': 'Root', 'hasChildren': True})
+        requests_mock.get(BASE_ITEMS_URL, json=_search)
+        sb_session = pysb.SbSession(env="beta")
+
+        tree = sb_session.walk_tree('root', max_workers=2)
+        assert tree['root']['childIds'] == ['a', 'b']
+        assert tree['c']['depth'] == 2
+        assert tree['c']['path'] == ['root', 'a', 'c']
+        assert tree['b']['childIds'] == []
+        # Only the root and 'a' have children to search for
+        assert requests_mock.call_count == 3
+
+    def test_delete_items_bulk_cascade(self, requests_mock):
+        children = {
+            'root': [{'id': 'a', 'parentId': 'root', 'hasChildren': True},
+                     {'id': 'b', 'parentId': 'root', 'hasChildren': False}],
+            'a': [{'id': 'c', 'parentId': 'a', 'hasChildren': False},
+                  {'id': 'd', 'parentId': 'a', 'hasChildren': False}],
+        }
+        deleted = []
+
+        def _search(request, context):
+            return {'items': children[request.qs['filter'][0].split('=')[1]]}
+
+        def _delete(request, context):
+            ids = [item['id'] for item in request.json()]
+            if 'c' in ids:
+                context.status_code = 400
+                return 'error'
+            deleted.append(ids)
+            return ''
+
+        requests_mock.get(BASE_ITEM_URL + 'root', json={'id': 'root', 'title': 'Root', 'hasChildren': True})
+        requests_mock.get(BASE_ITEMS_URL, json=_search)
+        requests_mock.delete(BASE_ITEMS_URL, text=_delete)
+        sb_session = pysb.SbSession(env="beta")
+
+        result = sb_session.delete_items_bulk(['root'], cascade=True, max_workers=1, retries=0)
+        # Leaves first, and the chunk holding the failing item is split to isolate it
+        assert deleted == [['d'], ['b']]
+        assert list(result.succeeded) == ['d', 'b']
+        assert sorted(result.failed) == ['a', 'c', 'root']
+
+    def test_delete_items_unauthorized(self, requests_mock):
+        requests_mock.delete(BASE_ITEMS_URL, status_code=401, text='unauthorized')
+        sb_session = pysb.SbSession(env="beta")
+
+        with pytest.raises(Exception) as exc_info:
+            sb_session.delete_items(['id%d' % i for i in range(1000)])
+        assert requests_mock.call_count == 1
+        assert 'id0: Unauthorized access' in str(exc_info.value)
+
+
+class TestResultSet():
+
+    def test_find_result_set(self, requests_mock):
+        all_ids = ['id%02d' % i for i in range(25)]
+
+        def _search(request, context):
+            offset = int(request.qs['offset'][0])
+            page_size = int(request.qs['max'][0])
+            return _page(all_ids[offset:offset + page_size], total=len(all_ids))
+
+        requests_mock.get(BASE_ITEMS_URL, json=_search)
+        sb_session = pysb.SbSession(env="beta")
+
+        results = sb_session.find_result_set({'q': 'test'}, page_size=10)
+        assert results[23]['id'] == 'id23'
+        assert requests_mock.request_history[0].qs['offset'] == ['20']
+        assert len(results) == 25
+        assert [item['id'] for item in results[8:12]] == all_ids[8:12]
+        assert results[-1]['id'] == 'id24'
+        assert results.page_count == 3
+        assert requests_mock.call_count == 3
+
+    def test_result_set_page_limit(self, requests_mock):
+        all_ids = ['id%02d' % i for i in range(25)]
+
+        def _search(request, context):
+            offset = int(request.qs['offset'][0])
+            page_size = min(int(request.qs['max'][0]), 4)
+            return _page(all_ids[offset:offset + page_size], total=len(all_ids))
+
+        requests_mock.get(BASE_ITEMS_URL, json=_search)
+        sb_session = pysb.SbSession(env="beta")
+        sb_session._max_item_count = 4
+
+        results = sb_session.find_result_set({'q': 'test'}, page_size=10)
+        assert results.page_size == 4
+        assert results[13]['id'] == 'id13'
+        assert [item['id'] for item in results] == all_ids
+
+
+class TestBulkWrite():
+
+    def test_update_items_bulk(self, requests_mock):
+        def _update(request, context):
+            items = request.json()
+            if any(item['id'] == 'bad' for item in items):
+                context.status_code = 400
+                return {'error': 'invalid item'}
+            return items
+
+        requests_mock.put(BASE_ITEMS_URL, json=_update)
+        sb_session = pysb.SbSession(env="beta")
+
+        items = [{'id': item_id, 'title': item_id} for item_id in ['a', 'b', 'bad', 'c', 'd']]
+        result = sb_session.update_items_bulk(items, max_items=4, max_workers=2, retries=0)
+        assert list(result.failed) == ['bad']
+        assert sorted(result.succeeded) == ['a', 'b', 'c', 'd']
+        assert result.succeeded['d'] == {'id': 'd', 'title': 'd'}
+
+    def test_update_items_bulk_server_error(self, requests_mock, monkeypatch):
+        monkeypatch.setattr(time, 'sleep', lambda seconds: None)
+        requests_mock.put(BASE_ITEMS_URL, status_code=503, text='unavailable')
+        sb_session = pysb.SbSession(env="beta")
+
+        items = [{'id': 'id%d' % i} for i in range(10)]
+        result = sb_session.update_items_bulk(items, max_items=10, retries=2)
+        # Retried, but not split into one request per item
+        assert requests_mock.call_count == 3
+        assert len(result.failed) == 10
+
+        requests_mock.put(BASE_ITEMS_URL, status_code=401, text='unauthorized')
+        result = sb_session.update_items_bulk(items, max_items=10, retries=2)
+        assert requests_mock.call_count == 4
+        assert result.failed['id0'] == 'Unauthorized access'
+
+    def test_ingest_items_resume(self, requests_mock, tmp_path):
+        source = tmp_path / 'items.jsonl'
+        source.write_text(''.join(json.dumps({'title': 'Item %d' % i, 'parentId': 'p'}) + '\n' for i in range(5)))
+        checkpoint = tmp_path / 'checkpoint.jsonl'
+        checkpoint.write_text(json.dumps({'batching': {'batch_size': 2, 'max_bytes': 5000000}}) + '\n' +
+                              json.dumps({'batch': 0, 'ids': ['id0', 'id1']}) + '\n')
+
+        def _upsert(request, context):
+            return [dict(item, id=item['title'].replace('Item ', 'id')) for item in request.json()]
+
+        requests_mock.post(BASE_ITEMS_URL + 'upsert/', json=_upsert)
+        sb_session = pysb.SbSession(env="beta")
+
+        result = sb_session.ingest_items(str(source), str(checkpoint), batch_size=2, max_workers=2)
+        assert result.ok
+        assert result.succeeded[2] == ['id4']
+        # The batch already committed was not sent again
+        assert requests_mock.call_count == 2
+        assert len(checkpoint.read_text().splitlines()) == 4
+
+        # Batches would split differently with another batch size
+        with pytest.raises(Exception):
+            sb_session.ingest_items(str(source), str(checkpoint), batch_size=3)
+        assert requests_mock.call_count == 2
+
+    def test_ingest_items_does_not_resend_creates(self, requests_mock, monkeypatch):
+        monkeypatch.setattr(time, 'sleep', lambda seconds: None)
+        requests_mock.post(BASE_ITEMS_URL + 'upsert/', exc=requests.exceptions.ReadTimeout)
+        sb_session = pysb.SbSession(env="beta")
+
+        # The timed out batch may have created its items, so it is not sent again
+        result = sb_session.ingest_items([{'title': 'new'}], retries=2)
+        assert list(result.failed) == [0]
+        assert requests_mock.call_count == 1
+
+        # A batch of updates is safe to send again
+        result = sb_session.ingest_items([{'id': 'a', 'title': 'a'}], retries=2)
+        assert list(result.failed) == [0]
+        assert requests_mock.call_count == 4
+
+    def test_move_items(self, requests_mock):
+        def _move(request, context):
+            if request.qs['itemid'] == ['bad']:
+                context.status_code = 400
+                return {}
+            return {'id': request.qs['itemid'][0]}
+
+        requests_mock.post(BASE_ITEMS_URL + 'move/', json=_move)
+        sb_session = pysb.SbSession(env="beta")
+
+        assert sb_session.move_items(['a', 'b'], 'p') == 2
+        with pytest.raises(Exception, match='bad'):
+            sb_session.move_items(['a', 'bad'], 'p')
+
+    def test_move_items_bulk(self, requests_mock):
+        def _move(request, context):
+            if request.qs['itemid'] == ['bad']:
+                context.status_code = 404
+                return {}
+            return {'id': request.qs['itemid'][0], 'parentId': request.qs['destid'][0]}
+
+        requests_mock.post(BASE_ITEMS_URL + 'move/', json=_move)
+        sb_session = pysb.SbSession(env="beta")
+        progress = []
+
+        result = sb_session.move_items_bulk(['a', 'bad', 'c'], 'p', max_workers=2,
+                                            progress_callback=lambda *args: progress.append(args))
+        assert sorted(result.succeeded) == ['a', 'c']
+        assert result.succeeded['a']['parentId'] == 'p'
+        assert list(result.failed) == ['bad']
+        assert sorted(p[0] for p in progress) == [1, 2, 3]
+
+    def test_add_extent(self, requests_mock):
+        extent_ids = iter(range(100, 200))
+
+        def _update(request, context):
+            return [dict(item, extents=[e if isinstance(e, int) else next(extent_ids) for e in item['extents']])
+                    for item in request.json()]
+
+        requests_mock.get(BASE_ITEMS_URL, json={'items': [{'id': 'a', 'extents': [1]}]})
+        requests_mock.put(BASE_ITEMS_URL, json=_update)
+        sb_session = pysb.SbSession(env="beta")
+
+        square = {'type': 'Polygon', 'coordinates': [[[0, 0], [0.5, 0.00001], [1, 0], [1, 1], [0, 1], [0, 0]]]}
+        features = {'type': 'FeatureCollection', 'features': [
+            {'type': 'Feature', 'properties': {'name': name}, 'geometry': square} for name in ['x', 'y', 'z']]}
+        item = sb_session.add_extent('a', features, tolerance=0.001)
+        assert item['extents'] == [1, 100, 101, 102]
+        # One search and two updates, whatever the number of features
+        assert requests_mock.call_count == 3
+        sent = requests_mock.request_history[1].json()[0]['extents']
+        assert sent[0]['geometry']['coordinates'] == [[[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]]
+
+    def test_add_extent_unindexed_item(self, requests_mock):
+        requests_mock.get(BASE_ITEMS_URL, json={'items': []})
+        requests_mock.get(BASE_ITEM_URL + 'new', json={'id': 'new', 'extents': [1]})
+        requests_mock.get(BASE_ITEM_URL + 'gone', status_code=404, text='Resource not found')
+        requests_mock.put(BASE_ITEMS_URL, json=lambda request, context: [
+            dict(item, extents=[e if isinstance(e, int) else 2 for e in item['extents']]) for item in request.json()])
+        sb_session = pysb.SbSession(env="beta")
+
+        point = {'type': 'Feature', 'properties': {}, 'geometry': {'type': 'Point', 'coordinates': [0, 0]}}
+        # A new item is readable before search returns it
+        assert sb_session.add_extent('new', point)['extents'] == [1, 2]
+        with pytest.raises(Exception):
+            sb_session.add_extent('gone', point)
+
+    def test_save_tracked_item(self, requests_mock):
+        graphql_url = 'https://api-beta.staging.sciencebase.gov/graphql'
+        requests_mock.get(BASE_ITEM_URL + 'a', json={'id': 'a', 'title': 'A', 'files': [{'name': 'f'}] * 3})
+        requests_mock.post(graphql_url, json={'data': {'updateItem': {'item': {'id': 'a'}}}})
+        sb_session = pysb.SbSession(env="beta")
+        sb_session._sbSessionEx = SbSessionEx.SbSessionEx(env='beta')
+        sb_session._sbSessionEx._authenticator.get_access_token = lambda *args, **kwargs: '1234'
+
+        item = sb_session.get_tracked_item('a')
+        sb_session.save_item(item)
+        assert requests_mock.call_count == 1
+
+        item['title'] = 'B'
+        item['files'][0]['name'] = 'g'
+        sb_session.save_item(item)
+        sent = requests_mock.request_history[-1].json()['variables']['input']
+        assert sent == {'id': 'a', 'itemPatch': {'title': 'B', 'files': item['files']}}
+        assert not item.is_changed()
+
+    def test_journal_resume(self, requests_mock, tmp_path):
+        journal_file = str(tmp_path / 'journal.jsonl')
+        requests_mock.post(BASE_ITEM_URL, [
+            {'json': {'id': 'new', 'title': 'New'}, 'status_code': 200},
+        ])
+        requests_mock.post(BASE_ITEMS_URL + 'move/', [
+            {'status_code': 500, 'text': 'error'},
+            {'json': {'id': 'new', 'parentId': 'p2'}, 'status_code': 200},
+        ])
+        sb_session = pysb.SbSession(env="beta").enable_journal(journal_file)
+
+        item = sb_session.create_item({'title': 'New', 'parentId': 'p1'})
+        with pytest.raises(Exception):
+            sb_session.move_item(item['id'], 'p2')
+
+        # Rerunning against the journal does not create the item again
+        sb_session = pysb.SbSession(env="beta").enable_journal(journal_file)
+        assert sb_session.create_item({'title': 'New', 'parentId': 'p1'})['id'] == 'new'
+        assert requests_mock.call_count == 2
+
+        result = sb_session.resume(journal_file)
+        assert list(result.succeeded.values()) == [{'id': 'new', 'parentId': 'p2'}]
+        assert not pysb.OperationJournal(journal_file).incomplete()
+        # The session's own journal saw the completion, so nothing is sent again
+        assert not sb_session._journal.incomplete()
+        assert not sb_session.resume(sb_session._journal).succeeded
+        assert requests_mock.call_count == 3
+
+
+    def test_journal_resume_unfinished_create(self, requests_mock, tmp_path):
+        journal_file = str(tmp_path / 'journal.jsonl')
+        journal = pysb.OperationJournal(journal_file)
+        # The create was sent, but the run stopped before its completion was recorded
+        key = journal.next_key('create_item', [{'title': 'New'}])
+        journal.begin(key, 'create_item', [{'title': 'New'}])
+        requests_mock.post(BASE_ITEM_URL, json={'id': 'new'})
+        sb_session = pysb.SbSession(env="beta")
+
+        result = sb_session.resume(journal_file)
+        assert list(result.failed) == [key]
+        assert requests_mock.call_count == 0
+
+
+class TestUpload():
+
+    def test_upload_files_and_upsert_item(self, requests_mock, tmp_path):
+        paths = []
+        for name, content in [('a.txt', b'alpha'), ('b.txt', b'beta' * 300000)]:
+            path = tmp_path / name
+            path.write_bytes(content)
+            paths.append(str(path))
+        requests_mock.post(BASE_ITEM_URL.replace('item/', 'file/uploadAndUpsertItem/'), json={'id': 'x'})
+        sb_session = pysb.SbSession(env="beta")
+
+        assert sb_session.upload_files_and_upsert_item({'id': 'x'}, paths)['id'] == 'x'
+        request = requests_mock.request_history[0]
+        assert request.qs['md5checksum'] == [hashlib.md5(b'alpha').hexdigest(),
+                                             hashlib.md5(b'beta' * 300000).hexdigest()]
+        body = request.body.read() if hasattr(request.body, 'read') else request.body
+        assert b'filename="b.txt"' in body
+        assert b'beta' * 300000 in body
+        assert int(request.headers['Content-Length']) == len(body)
+        assert sb_session.get_file_checksum(paths[1]) == hashlib.md5(b'beta' * 300000).hexdigest()
+
+    def test_small_upload_files_are_read_once(self, requests_mock, tmp_path, monkeypatch):
+        small, large = tmp_path / 'small.txt', tmp_path / 'large.txt'
+        small.write_bytes(b's' * 10)
+        large.write_bytes(b'l' * 100)
+        requests_mock.post(BASE_ITEM_URL.replace('item/', 'file/uploadAndUpsertItem/'), json={'id': 'x'})
+        sb_session = pysb.SbSession(env="beta")
+        sb_session._max_buffered_upload_bytes = 50
+        hashed = []
+        monkeypatch.setattr(sb_session, 'get_file_checksum', lambda filename: hashed.append(filename) or 'md5')
+
+        sb_session.upload_files_and_upsert_item({'id': 'x'}, [str(small), str(large)])
+        # Only the file too large for the buffer is hashed separately from being sent
+        assert hashed == [str(large)]
+        assert requests_mock.request_history[0].qs['md5checksum'] == [hashlib.md5(b's' * 10).hexdigest(), 'md5']
+        assert sb_session._buffered_upload_bytes == 0
+
+        # The buffer is shared with the session's other uploads
+        sb_session._buffered_upload_bytes = 45
+        sb_session.upload_files_and_upsert_item({'id': 'x'}, [str(small)])
+        assert hashed == [str(large), str(small)]
+        assert sb_session._buffered_upload_bytes == 45
+
+    def test_checksum_cache(self, tmp_path, monkeypatch):
+        path = tmp_path / 'a.txt'
+        path.write_bytes(b'alpha')
+        sb_session = pysb.SbSession(env="beta").enable_checksum_cache(str(tmp_path / 'checksums.db'))
+        assert sb_session.get_file_checksum(str(path)) == hashlib.md5(b'alpha').hexdigest()
+
+        # Unchanged files are not hashed again, even by a new cache on the same database
+        first_cache = sb_session._checksum_cache
+        sb_session.enable_checksum_cache(str(tmp_path / 'checksums.db'))
+        # The previous cache's database was closed
+        with pytest.raises(Exception):
+            first_cache.get(str(path))
+        monkeypatch.setattr(sys.modules['sciencebasepy.ChecksumCache'], 'file_md5', None)
+        assert sb_session.get_file_checksum(str(path)) == hashlib.md5(b'alpha').hexdigest()
+        assert sb_session.checksum_many([str(path)]) == {str(path): hashlib.md5(b'alpha').hexdigest()}
+
+        monkeypatch.undo()
+        path.write_bytes(b'alphabet')
+        assert sb_session.get_file_checksum(str(path)) == hashlib.md5(b'alphabet').hexdigest()
+
+        # A cache passed in by the caller is left open
+        cache = pysb.ChecksumCache(str(tmp_path / 'checksums.db'))
+        sb_session.enable_checksum_cache(cache).disable_checksum_cache()
+        assert cache.get(str(path)) == hashlib.md5(b'alphabet').hexdigest()
+        cache.close()
+
+    def test_checksum_many(self, tmp_path):
+        contents = {str(tmp_path / ('%d.bin' % i)): bytes([i]) * (i * 70000) for i in range(8)}
+        for path, content in contents.items():
+            with open(path, 'wb') as f:
+                f.write(content)
+        checksums = pysb.SbSession(env="beta").checksum_many(list(contents), max_workers=3)
+        assert list(checksums) == list(contents)
+        assert all(checksums[path] == hashlib.md5(content).hexdigest() for path, content in contents.items())
+
+    def test_multipart_encoder(self, tmp_path):
+        path = tmp_path / 'a.bin'
+        path.write_bytes(b'x' * 100000)
+        progress = []
+        body = pysb.multipart.MultipartEncoder([('item', '{}')], [('file', None, str(path), 'text/plain')],
+                                               lambda sent, total: progress.append((sent, total)), chunk_size=4096)
+        blocks = iter(lambda: body.read(1000), b'')
+        data = b''.join(blocks)
+        assert len(data) == len(body) == progress[-1][0] == progress[-1][1]
+        assert b'name="file"; filename="a.bin"\r\nContent-Type: text/plain\r\n\r\n' + b'x' * 100000 in data
+        assert data.endswith(('--%s--\r\n' % body.boundary).encode())
+
+    def test_upload_files_bulk(self, requests_mock, tmp_path):
+        files_by_item = {'x': [], 'y': []}
+        for i in range(5):
+            path = tmp_path / ('%d.txt' % i)
+            path.write_bytes(b'z' * 10)
+            files_by_item['x' if i < 3 else 'y'].append(str(path))
+        requests_mock.post(BASE_ITEM_URL.replace('item/', 'file/uploadAndUpsertItem/'),
+                           json=lambda request, context: {'id': request.qs['id'][0]})
+        sb_session = pysb.SbSession(env="beta")
+
+        result = sb_session.upload_files_bulk(files_by_item, max_files=2, max_bytes=100, max_workers=2)
+        assert result.ok
+        assert result.succeeded['x'] == {'id': 'x'}
+        assert sorted(len(request.qs['md5checksum']) for request in requests_mock.request_history) == [1, 2, 2]
+
+    def test_upload_files_bulk_retries(self, requests_mock, tmp_path, monkeypatch):
+        monkeypatch.setattr(time, 'sleep', lambda seconds: None)
+        path = tmp_path / 'a.txt'
+        path.write_bytes(b'z' * 10)
+        url = BASE_ITEM_URL.replace('item/', 'file/uploadAndUpsertItem/')
+        sb_session = pysb.SbSession(env="beta")
+
+        # The upload may have been committed, so it is not sent again
+        requests_mock.post(url, exc=requests.exceptions.ReadTimeout)
+        result = sb_session.upload_files_bulk({'x': [str(path)]}, retries=2)
+        assert list(result.failed) == ['x']
+        assert requests_mock.call_count == 1
+
+        # A connection that was never made is retried
+        requests_mock.post(url, [{'exc': requests.exceptions.ConnectTimeout}, {'json': {'id': 'x'}}])
+        result = sb_session.upload_files_bulk({'x': [str(path)]}, retries=2)
+        assert result.succeeded['x'] == {'id': 'x'}
+        assert requests_mock.call_count == 3
+
+    def test_sync_directory_to_item(self, requests_mock, tmp_path):
+        for name, content in [('a.txt', b'same'), ('b.txt', b'changed'), ('d.txt', b'new')]:
+            (tmp_path / name).write_bytes(content)
+        b_json = {'name': 'b.txt', 'size': 7, 'contentType': 'text/plain',
+                  'checksum': {'value': hashlib.md5(b'chanGED').hexdigest(), 'type': 'MD5'}}
+        item = {'id': 'x', 'files': [
+            {'name': 'a.txt', 'size': 4, 'checksum': {'value': hashlib.md5(b'same').hexdigest(), 'type': 'MD5'}},
+            dict(b_json), {'name': 'c.txt', 'size': 1}],
+            'facets': [{'name': 'f', 'files': [dict(b_json)]}]}
+        requests_mock.get(BASE_ITEM_URL + 'x', json=item)
+        requests_mock.post(BASE_ITEM_URL.replace('item/', 'file/upload/'),
+                           json=[{'fileKey': 'key1', 'dateUploaded': 'now', 'uploadedBy': 'me'}])
+        requests_mock.put(BASE_ITEM_URL + 'x', json=lambda request, context: request.json())
+        requests_mock.post(BASE_ITEM_URL.replace('item/', 'file/uploadAndUpsertItem/'), json={'id': 'x'})
+        sb_session = pysb.SbSession(env="beta")
+
+        report = sb_session.sync_directory_to_item(str(tmp_path), 'x', dry_run=True)
+        assert (report['new'], report['changed'], report['unchanged']) == (['d.txt'], ['b.txt'], ['a.txt'])
+
+        report = sb_session.sync_directory_to_item(str(tmp_path), 'x', delete=True)
+        assert report['deleted'] == ['c.txt']
+        methods = [request.method for request in requests_mock.request_history[1:]]
+        assert methods == ['GET', 'POST', 'PUT', 'POST']
+        update = requests_mock.request_history[3].json()
+        assert [f['name'] for f in update['files']] == ['a.txt', 'b.txt']
+        assert update['files'][1]['pathOnDisk'] == update['facets'][0]['files'][0]['pathOnDisk'] == 'key1'
+        assert update['files'][1]['checksum']['value'] == hashlib.md5(b'changed').hexdigest()
+
+    def test_sync_directory_size_change(self, requests_mock, tmp_path):
+        (tmp_path / 'c.txt').write_bytes(b'longer content')
+        stored = {'id': 'x', 'files': [{'name': 'c.txt', 'size': 3, 'contentType': 'text/plain',
+                                        'checksum': {'value': hashlib.md5(b'old').hexdigest(), 'type': 'MD5'}}]}
+
+        def _update(request, context):
+            stored.update(request.json())
+            return stored
+
+        requests_mock.get(BASE_ITEM_URL + 'x', json=lambda request, context: stored)
+        requests_mock.post(BASE_ITEM_URL.replace('item/', 'file/upload/'),
+                           json=[{'fileKey': 'key1', 'dateUploaded': 'now', 'uploadedBy': 'me'}])
+        requests_mock.put(BASE_ITEM_URL + 'x', json=_update)
+        sb_session = pysb.SbSession(env="beta")
+
+        assert sb_session.sync_directory_to_item(str(tmp_path), 'x')['changed'] == ['c.txt']
+        assert stored['files'][0]['size'] == len(b'longer content')
+        # The next sync finds nothing to upload
+        assert sb_session.sync_directory_to_item(str(tmp_path), 'x')['unchanged'] == ['c.txt']
+
+    def test_sync_directory_batches_changed_files(self, requests_mock, tmp_path):
+        names = ['a.txt', 'b.txt', 'c.txt']
+        for name in names:
+            (tmp_path / name).write_bytes(b'new ' + name.encode())
+        item = {'id': 'x', 'files': [{'name': name, 'size': 1} for name in names]}
+        requests_mock.get(BASE_ITEM_URL + 'x', json=item)
+        requests_mock.post(BASE_ITEM_URL.replace('item/', 'file/upload/'), json=lambda request, context: [
+            {'fileKey': 'key-%s' % checksum, 'dateUploaded': 'now', 'uploadedBy': 'me'}
+            for checksum in request.qs['md5checksum']])
+        requests_mock.put(BASE_ITEM_URL + 'x', json=lambda request, context: request.json())
+        sb_session = pysb.SbSession(env="beta")
+
+        report = sb_session.sync_directory_to_item(str(tmp_path), 'x', max_files=2)
+        assert report['changed'] == names
+        methods = [request.method for request in requests_mock.request_history]
+        assert methods == ['GET', 'POST', 'POST', 'PUT']
+        assert [f['pathOnDisk'] for f in report['item']['files']] == [
+            'key-' + hashlib.md5(b'new ' + name.encode()).hexdigest() for name in names]
+
+    def test_replace_file(self, requests_mock, tmp_path):
+        path = tmp_path / 'b.txt'
+        path.write_bytes(b'new content')
+        entry = {'name': 'b.txt', 'contentType': 'text/plain', 'pathOnDisk': 'old'}
+        item = {'id': 'x', 'files': [dict(entry)], 'facets': [{'name': 'f', 'files': [dict(entry)]}]}
+        requests_mock.post(BASE_ITEM_URL.replace('item/', 'file/upload/'),
+                           json=[{'fileKey': 'key1', 'dateUploaded': 'now', 'uploadedBy': 'me'}])
+        requests_mock.put(BASE_ITEM_URL + 'x', json=lambda request, context: request.json())
+        sb_session = pysb.SbSession(env="beta")
+
+        item = sb_session.replace_file(str(path), item)
+        assert [request.method for request in requests_mock.request_history] == ['POST', 'PUT']
+        assert item['files'][0]['pathOnDisk'] == item['facets'][0]['files'][0]['pathOnDisk'] == 'key1'
+
+    def test_replace_large_file_in_cloud(self, requests_mock, tmp_path):
+        path = tmp_path / 'b.txt'
+        path.write_bytes(b'large content')
+        entry = {'name': 'b.txt', 'contentType': 'text/plain', 'pathOnDisk': 'old', 'dateUploaded': 'then'}
+        item = {'id': 'x', 'files': [dict(entry)], 'facets': [{'name': 'f', 'files': [dict(entry)]}]}
+        uploads = []
+
+        class _CloudSession:
+            def is_logged_in(self):
+                return True
+
+            def upload_cloud_file_upload_session(self, item_id, filename, mimetype=None):
+                uploads.append((item_id, filename))
+                return {'data': {'completeMultiPartUpload': 'Successful'}}
+
+        requests_mock.get(BASE_ITEM_URL + 'x', json={'files': [
+            {'name': 'b.txt', 'pathOnDisk': 'cloud/key', 'dateUploaded': 'now', 'size': 13}]})
+        requests_mock.put(BASE_ITEM_URL + 'x', json=lambda request, context: request.json())
+        sb_session = pysb.SbSession(env="beta")
+        sb_session._max_temp_upload_bytes = 5
+        sb_session._sbSessionEx = _CloudSession()
+
+        item = sb_session.replace_file(str(path), item)
+        assert uploads == [('x', str(path))]
+        assert item['files'][0]['pathOnDisk'] == item['facets'][0]['files'][0]['pathOnDisk'] == 'cloud/key'
+        assert item['facets'][0]['files'][0]['size'] == 13